@@ -0,0 +1,268 @@
+import fnmatch
+import threading
+import time
+from types import SimpleNamespace
+
+
+class FakeResponse(SimpleNamespace):
+    """Mimics postgrest's APIResponse (.data, .count)."""
+
+
+class FakeQuery:
+    """
+    In-memory stand-in for a supabase-py / PostgREST query builder.
+    Supports the subset of filters PyLife uses; every execute() is one round trip.
+    """
+
+    def __init__(self, client, table):
+        self.client = client
+        self.table_name = table
+        self.action = "select"
+        self.columns = "*"
+        self.count_mode = None
+        self.filters = []
+        self.order_by = []
+        self.limit_n = None
+        self.range_ = None
+        self.payload = None
+        self.on_conflict = None
+
+    # --- actions ---
+    def select(self, columns="*", count=None):
+        self.action, self.columns, self.count_mode = "select", columns, count
+        return self
+
+    def insert(self, rows):
+        self.action, self.payload = "insert", rows
+        return self
+
+    def upsert(self, rows, on_conflict=None):
+        self.action, self.payload, self.on_conflict = "upsert", rows, on_conflict
+        return self
+
+    def update(self, values):
+        self.action, self.payload = "update", values
+        return self
+
+    def delete(self):
+        self.action = "delete"
+        return self
+
+    # --- filters ---
+    def _filter(self, func):
+        self.filters.append(func)
+        return self
+
+    def eq(self, col, value):
+        return self._filter(lambda r: r.get(col) == value)
+
+    def neq(self, col, value):
+        return self._filter(lambda r: r.get(col) != value)
+
+    def gt(self, col, value):
+        return self._filter(lambda r: r.get(col) is not None and r.get(col) > value)
+
+    def gte(self, col, value):
+        return self._filter(lambda r: r.get(col) is not None and r.get(col) >= value)
+
+    def lt(self, col, value):
+        return self._filter(lambda r: r.get(col) is not None and r.get(col) < value)
+
+    def lte(self, col, value):
+        return self._filter(lambda r: r.get(col) is not None and r.get(col) <= value)
+
+    def in_(self, col, values):
+        values = set(values)
+        return self._filter(lambda r: r.get(col) in values)
+
+    def is_(self, col, value):
+        value = None if value in (None, "null") else value
+        return self._filter(lambda r: r.get(col) is value)
+
+    def ilike(self, col, pattern):
+        pattern = pattern.lower().replace("%", "*").replace("_", "?")
+        return self._filter(lambda r: r.get(col) is not None and fnmatch.fnmatchcase(str(r.get(col)).lower(), pattern))
+
+    def order(self, col, desc=False):
+        self.order_by.append((col, desc))
+        return self
+
+    def limit(self, n):
+        self.limit_n = n
+        return self
+
+    def range(self, start, end):
+        self.range_ = (start, end)
+        return self
+
+    # --- execution ---
+    def _project(self, row):
+        if self.columns.strip() == "*":
+            return dict(row)
+        cols = [c.strip() for c in self.columns.split(",")]
+        return {c: row.get(c) for c in cols}
+
+    def _matching(self, rows):
+        return [r for r in rows if all(f(r) for f in self.filters)]
+
+    def execute(self):
+        return self.client._execute(self)
+
+
+class FakeRPC:
+    def __init__(self, client, name, params):
+        self.client, self.name, self.params = client, name, params or {}
+
+    def execute(self):
+        return self.client._execute_rpc(self)
+
+
+class FakeSupabase:
+    """
+    Drop-in replacement for the object returned by modules.database.get_client().
+
+    latency: seconds slept per request (simulates the network)
+    rpcs: {name: func(client, params) -> data}; unknown RPCs raise like PostgREST does
+    stats: request counts per (table|rpc, action)
+    """
+
+    MAX_ROWS = 1000  # PostgREST default row limit
+
+    def __init__(self, latency=0.0, rpcs=None):
+        self.latency = latency
+        self.rpcs = dict(rpcs or {})
+        self.tables = {}
+        self._next_id = {}
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.stats = {}
+
+    # --- seeding helpers ---
+    def seed(self, table, rows):
+        """Bulk-loads rows without counting round trips. Returns the stored rows."""
+        with self._lock:
+            return [self._store(table, dict(r)) for r in rows]
+
+    def _store(self, table, row):
+        rows = self.tables.setdefault(table, [])
+        if row.get('id') is None:
+            row['id'] = self._next_id.get(table, 0) + 1
+        self._next_id[table] = max(self._next_id.get(table, 0), row['id'])
+        rows.append(row)
+        return row
+
+    def reset_stats(self):
+        with self._lock:
+            self.requests = 0
+            self.stats = {}
+
+    # --- client API ---
+    def table(self, name):
+        return FakeQuery(self, name)
+
+    def rpc(self, name, params=None):
+        return FakeRPC(self, name, params)
+
+    # --- internals ---
+    def _count(self, key):
+        self.requests += 1
+        self.stats[key] = self.stats.get(key, 0) + 1
+
+    def _execute(self, q):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self._count(f"{q.table_name}.{q.action}")
+            rows = self.tables.setdefault(q.table_name, [])
+
+            if q.action in ("insert", "upsert"):
+                payload = q.payload if isinstance(q.payload, list) else [q.payload]
+                out = []
+                for new in payload:
+                    existing = None
+                    if q.action == "upsert" and q.on_conflict:
+                        existing = next((r for r in rows if r.get(q.on_conflict) == new.get(q.on_conflict)), None)
+                    if existing is not None:
+                        existing.update(new)
+                        out.append(dict(existing))
+                    else:
+                        out.append(dict(self._store(q.table_name, dict(new))))
+                return FakeResponse(data=out, count=None)
+
+            self._check_columns(q, rows)
+            matched = q._matching(rows)
+
+            if q.action == "update":
+                for r in matched:
+                    r.update(q.payload)
+                return FakeResponse(data=[dict(r) for r in matched], count=None)
+
+            if q.action == "delete":
+                self.tables[q.table_name] = [r for r in rows if r not in matched]
+                return FakeResponse(data=[dict(r) for r in matched], count=None)
+
+            for col, desc in reversed(q.order_by):
+                matched = sorted(matched, key=lambda r: (r.get(col) is None, r.get(col)), reverse=desc)
+            total = len(matched)
+            if q.range_ is not None:
+                matched = matched[q.range_[0]:q.range_[1] + 1]
+            if q.limit_n is not None:
+                matched = matched[:q.limit_n]
+            matched = matched[:self.MAX_ROWS]
+            return FakeResponse(data=[q._project(r) for r in matched],
+                                count=total if q.count_mode else None)
+
+    def _check_columns(self, q, rows):
+        """Like PostgREST, reject selects/orders on columns the table doesn't have."""
+        if not rows or q.action != "select":
+            return
+        known = rows[0].keys()
+        wanted = [] if q.columns.strip() == "*" else [c.strip() for c in q.columns.split(",")]
+        wanted += [col for col, _ in q.order_by]
+        for col in wanted:
+            if col not in known:
+                raise Exception(f"column {q.table_name}.{col} does not exist")
+
+    def _execute_rpc(self, call):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self._count(f"rpc.{call.name}")
+            func = self.rpcs.get(call.name)
+        if func is None:
+            raise Exception(f"Could not find the function public.{call.name} in the schema cache")
+        return FakeResponse(data=func(self, call.params), count=None)
+
+
+# --- Local stand-ins for the Postgres functions in sql/ ---
+
+def rpc_settle_payment(client, params):
+    """Same effect as sql/settle_payment.sql: insert payments, mark debts settled."""
+    with client._lock:
+        for row in params.get("payment_rows") or []:
+            client._store("payments", dict(row))
+        settled = set(params.get("settled_ids") or [])
+        for debt in client.tables.get("debts", []):
+            if debt['id'] in settled:
+                debt['status'] = "Settled"
+    return None
+
+
+def rpc_get_expense_stats(client, params):
+    """Totals per category and health status for one 'YYYY-MM' month."""
+    month = params.get("target_month")
+    totals = {}
+    with client._lock:
+        for e in client.tables.get("expenses", []):
+            if month and not str(e['date']).startswith(month):
+                continue
+            status = "Healthy" if e.get('is_healthy') else "Unhealthy"
+            key = (e.get('category'), status)
+            totals[key] = totals.get(key, 0.0) + float(e['amount'])
+    return [{"category": c, "health_status": h, "total_spent": round(t, 2)} for (c, h), t in totals.items()]
+
+
+DEFAULT_RPCS = {
+    "settle_payment": rpc_settle_payment,
+    "get_expense_stats": rpc_get_expense_stats,
+}
@@ -0,0 +1,310 @@
+"""
+Microbenchmarks for PyLife against an in-memory Supabase stand-in.
+
+Usage:
+    python benchmarks/run_benchmarks.py                 # compare with baseline.json
+    python benchmarks/run_benchmarks.py --latency 0.02  # simulate a 20 ms network
+    python benchmarks/run_benchmarks.py --update-baseline
+
+Each operation reports its median wall time and the number of round trips
+(client requests) it made. The run fails (exit code 1) if any operation makes
+more round trips, or takes longer, than its baseline allows.
+
+"startup: <command>" entries time a fresh interpreter importing main.py plus
+the modules that command loads, and fail if the Supabase SDK gets imported
+before the client is actually used.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(BENCH_DIR)
+BASELINE_FILE = os.path.join(BENCH_DIR, 'baseline.json')
+sys.path.insert(0, PROJECT_ROOT)
+sys.path.insert(0, BENCH_DIR)
+
+# Never talk to a real project from a benchmark
+os.environ["SUPABASE_URL"] = "http://localhost:54321"
+os.environ["SUPABASE_KEY"] = "benchmark-key"
+os.environ["PYLIFE_OFFLINE_WRITES"] = "0"
+
+from fake_supabase import FakeSupabase, DEFAULT_RPCS  # noqa: E402
+from modules import database  # noqa: E402
+
+# Headroom applied to measured times when writing a new baseline
+TIME_HEADROOM = 3.0
+
+
+# --- DATA VOLUMES ---
+FRIENDS = 200
+EXPENSES = 20000
+ITEMS = 2000
+DEBTS = 2000
+FITNESS_DAYS = 900
+
+
+def seed(client):
+    """Realistic volumes: a few years of expenses, a big friend list, lots of open debts."""
+    rng = random.Random(42)
+    today = date.today()
+
+    client.seed("friends", [{"name": "Me", "phone": None}] +
+                [{"name": f"Friend {i}", "phone": None} for i in range(1, FRIENDS)])
+    client.seed("item_health", [{"item": f"item {i}", "is_healthy": i % 3 != 0} for i in range(ITEMS)])
+    client.seed("expenses", [
+        {
+            "date": (today - timedelta(days=rng.randint(0, 900))).strftime("%Y-%m-%d"),
+            "item": f"item {rng.randint(0, ITEMS - 1)}",
+            "amount": round(rng.uniform(20, 800), 2),
+            "category": rng.choice(["Food", "Transport", "Bills"]),
+            "is_healthy": rng.random() < 0.5,
+        }
+        for _ in range(EXPENSES)
+    ])
+    client.seed("debts", [
+        {
+            "date": (today - timedelta(days=rng.randint(0, 365))).strftime("%Y-%m-%d"),
+            "borrower_id": rng.randint(2, FRIENDS),
+            "lender_id": 1,
+            "amount": round(rng.uniform(50, 500), 2),
+            "description": "Dinner",
+            "status": "Active",
+        }
+        for _ in range(DEBTS)
+    ])
+    client.seed("workouts", [
+        {"created_at": f"{today - timedelta(days=d)}T07:30:00", "workout_type": "Push"}
+        for d in range(FITNESS_DAYS) if rng.random() < 0.6
+    ])
+    client.seed("nutrition_logs", [
+        {"created_at": f"{today - timedelta(days=d)}T13:00:00", "item_name": "Eggs", "protein_g": rng.randint(10, 40)}
+        for d in range(FITNESS_DAYS) for _ in range(3)
+    ])
+
+
+def add_open_debts(client, borrower, count):
+    """Gives 'borrower' a stack of small debts to pay back (setup, not measured)."""
+    client.seed("debts", [
+        {"date": "2024-01-01", "borrower_id": borrower, "lender_id": 1,
+         "amount": 10.0, "description": "Chai", "status": "Active"}
+        for _ in range(count)
+    ])
+
+
+# --- OPERATIONS ---
+# name -> (setup(client) -> args, run(*args))
+
+def build_operations():
+    from modules import finance_manager, fitness_series, social_manager, report_generator
+
+    def warm_caches(client):
+        social_manager.get_friend_id("Me")
+        finance_manager.check_item_health("item 1")
+
+    def pay_back_30(client):
+        warm_caches(client)
+        add_open_debts(client, borrower=7, count=30)
+        return ()
+
+    def fitness_ready(client):
+        if not fitness_series.is_built():
+            fitness_series.rebuild()
+        fitness_series.get_window(7)
+
+    def report(client):
+        report_generator.generate_monthly_report()
+        return report_generator.wait_for_export()
+
+    return {
+        "get_friend_id (cold)": (
+            lambda c: social_manager.invalidate_friend_cache(),
+            lambda: social_manager.get_friend_id("Friend 42"),
+        ),
+        "get_friend_id (warm)": (
+            lambda c: social_manager.get_friend_id("Me"),
+            lambda: social_manager.get_friend_id("Friend 42"),
+        ),
+        "check_item_health (warm)": (
+            lambda c: finance_manager.check_item_health("item 5"),
+            lambda: finance_manager.check_item_health("item 5"),
+        ),
+        "log_expense (known item)": (
+            warm_caches,
+            lambda: finance_manager.log_expense("item 1", 120.0, "Food"),
+        ),
+        "log_expenses_batch (20 items)": (
+            warm_caches,
+            lambda: finance_manager.log_expenses_batch(
+                [{"item": f"item {i}", "amount": 50.0} for i in range(20)]),
+        ),
+        "log_debt": (
+            warm_caches,
+            lambda: social_manager.log_debt("Friend 3", "Me", 250.0, "Movie"),
+        ),
+        "record_payment (30 debts)": (
+            pay_back_30,
+            lambda: social_manager.record_payment("Friend 6", "Me", 300.0),
+        ),
+        "split_expense (6 people)": (
+            warm_caches,
+            lambda: social_manager.split_expense(
+                "Me", 1200.0, ["Me", "Friend 1", "Friend 2", "Friend 3", "Friend 4", "Friend 5"],
+                "Pizza", is_healthy=False),
+        ),
+        "fitness summary (7/30/90/365)": (
+            fitness_ready,
+            lambda: fitness_series.summary(),
+        ),
+        "generate_monthly_report": (
+            lambda c: None,
+            lambda: report(None),
+        ),
+    }
+
+
+# --- STARTUP ---
+# command -> modules main.py imports for it
+STARTUP_COMMANDS = {
+    "--help": [],
+    "log_expense": ["modules.finance_manager"],
+    "list_friends": ["modules.social_manager"],
+    "report": ["modules.report_generator"],
+    "rebuild_rollups": ["modules.rollups"],
+    "import_statement": ["modules.statement_importer"],
+}
+
+# Heavy packages no command should import just by starting up
+EAGER_IMPORTS = ("supabase", "pandas", "openpyxl", "pyarrow", "duckdb", "PIL", "pytesseract")
+
+STARTUP_SCRIPT = """
+import importlib, json, sys, time
+start = time.perf_counter()
+import main
+for name in sys.argv[1:]:
+    importlib.import_module(name)
+elapsed = time.perf_counter() - start
+print(json.dumps({"seconds": elapsed, "eager": [m for m in %r if m in sys.modules]}))
+""" % (EAGER_IMPORTS,)
+
+
+def measure_startup(modules, iterations):
+    """Returns (median seconds, heavy packages imported) over fresh interpreters."""
+    timings = []
+    eager = []
+    for _ in range(iterations):
+        out = subprocess.run([sys.executable, "-c", STARTUP_SCRIPT, *modules], cwd=PROJECT_ROOT,
+                             capture_output=True, text=True, check=True).stdout
+        result = json.loads(out.strip().splitlines()[-1])
+        timings.append(result["seconds"])
+        eager = result["eager"]
+    return statistics.median(timings), eager
+
+
+def measure(client, setup, run, iterations):
+    """Returns (median seconds, round trips of the last run)."""
+    timings = []
+    trips = 0
+    for _ in range(iterations):
+        setup(client)
+        client.reset_stats()
+        start = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - start)
+        trips = client.requests
+    return statistics.median(timings), trips
+
+
+def point_local_files_at(tmp):
+    """Keeps journals, rollups and reports out of the real data/ and reports/ folders."""
+    from modules import write_journal, rollups, fitness_series, report_generator, ocr_handler
+    write_journal.JOURNAL_FILE = os.path.join(tmp, 'journal.db')
+    rollups.ROLLUP_FILE = os.path.join(tmp, 'rollups.db')
+    fitness_series.FITNESS_FILE = os.path.join(tmp, 'fitness.db')
+    report_generator.REPORTS_FOLDER = tmp
+    report_generator.EXCEL_FILE = os.path.join(tmp, 'data.xlsx')
+    report_generator.FINGERPRINT_FILE = os.path.join(tmp, '.export_fingerprint.json')
+    ocr_handler.OCR_CACHE_FOLDER = os.path.join(tmp, 'ocr_cache')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PyLife microbenchmarks")
+    parser.add_argument("--latency", type=float, default=0.0, help="Injected seconds per request")
+    parser.add_argument("--iterations", type=int, default=5, help="Runs per operation")
+    parser.add_argument("--only", type=str, help="Run operations whose name contains this text")
+    parser.add_argument("--update-baseline", action="store_true", help="Write results to baseline.json")
+    args = parser.parse_args()
+
+    client = FakeSupabase(latency=0.0, rpcs=DEFAULT_RPCS)
+    seed(client)
+    database.set_client(client)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        point_local_files_at(tmp)
+        client.latency = args.latency
+
+        results = {}
+        for name, (setup, run) in build_operations().items():
+            if args.only and args.only not in name:
+                continue
+            seconds, trips = measure(client, setup, run, args.iterations)
+            results[name] = {"ms": round(seconds * 1000, 3), "round_trips": trips}
+
+    failures = []
+    for command, modules in STARTUP_COMMANDS.items():
+        name = f"startup: {command}"
+        if args.only and args.only not in name:
+            continue
+        seconds, eager = measure_startup(modules, args.iterations)
+        results[name] = {"ms": round(seconds * 1000, 3), "round_trips": 0}
+        if eager:
+            failures.append(f"{name}: imports {', '.join(eager)} at startup")
+
+    # --- REPORT ---
+    baseline = {}
+    if os.path.exists(BASELINE_FILE):
+        with open(BASELINE_FILE, encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    print(f"{'Operation':<34} {'ms':>10} {'trips':>6}   baseline (ms / trips)")
+    print("-" * 80)
+    for name, r in results.items():
+        b = baseline.get(name)
+        limit = f"{b['max_ms']:>8} / {b['max_round_trips']}" if b else "      -"
+        print(f"{name:<34} {r['ms']:>10} {r['round_trips']:>6}   {limit}")
+        if b and not args.update_baseline:
+            if r['round_trips'] > b['max_round_trips']:
+                failures.append(f"{name}: {r['round_trips']} round trips > {b['max_round_trips']}")
+            # Time limits only mean something without injected latency
+            if args.latency == 0 and r['ms'] > b['max_ms']:
+                failures.append(f"{name}: {r['ms']} ms > {b['max_ms']} ms")
+
+    if args.update_baseline:
+        for name, r in results.items():
+            baseline[name] = {"max_ms": round(max(r['ms'] * TIME_HEADROOM, 1.0), 1),
+                              "max_round_trips": r['round_trips']}
+        with open(BASELINE_FILE, 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"\n📝 Baseline written to {BASELINE_FILE}")
+        return 0
+
+    if failures:
+        print("\n❌ Regressions:")
+        for failure in failures:
+            print(f"   - {failure}")
+        return 1
+
+    print("\n✅ All operations within baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
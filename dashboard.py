@@ -1,85 +1,223 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-import os
-from dotenv import load_dotenv
-from supabase import create_client
+import threading
+import time
+from datetime import date, timedelta
+from modules.database import get_client, is_missing_function
+from modules.downsample import lttb
 
 # --- 1. SETUP SUPABASE CONNECTION ---
-# Load environment variables
-load_dotenv()
-
-url = os.getenv("SUPABASE_URL")
-key = os.getenv("SUPABASE_KEY")
-
-# Stop if credentials are missing
-if not url or not key:
-    st.error("❌ Supabase credentials missing. Please check your .env file.")
-    st.stop()
-
-# Initialize Client
+# Same client as the CLI and the MCP server (credentials from .env, or PYLIFE_BACKEND=sqlite)
 try:
-    supabase = create_client(url, key)
+    supabase = get_client()
 except Exception as e:
-    st.error(f"❌ Failed to connect to Supabase: {e}")
+    st.error(f"❌ Failed to connect to the database: {e}")
     st.stop()
 
 
 # --- 2. LOAD DATA FUNCTIONS ---
-def load_data():
-    """Fetches Expenses, Debts, and Friends from Supabase"""
+PAGE_SIZE = 1000               # PostgREST returns at most this many rows per request
+FULL_RECONCILE_SECONDS = 600   # full re-fetch to pick up edits/deletes (e.g. debt status)
+MIN_SYNC_SECONDS = 2           # panels rendered in the same run share one sync
+AUTO_REFRESH_SECONDS = 60
+DEFAULT_RANGE_DAYS = 90
+CHART_MAX_POINTS = 500         # about one point per pixel of a half-width chart
+LOG_PAGE_SIZE = 50
+
+TABLES = {
+    "expenses": "*",
+    "debts": "*",
+    "friends": "id, name",
+}
+
+
+@st.cache_resource
+def get_table_store():
+    """Process-wide cache: one DataFrame per table plus its id watermark."""
+    return {"lock": threading.Lock(), "tables": {}}
+
+
+def fetch_rows(table, columns, after_id=None):
+    """Fetches rows with id > after_id (or all rows), page by page."""
+    rows = []
+    start = 0
+    while True:
+        query = supabase.table(table).select(columns).order("id")
+        if after_id is not None:
+            query = query.gt("id", after_id)
+        page = query.range(start, start + PAGE_SIZE - 1).execute().data
+        rows.extend(page)
+        if len(page) < PAGE_SIZE:
+            return rows
+        start += PAGE_SIZE
 
-    # A. Fetch Expenses
-    response_exp = supabase.table("expenses").select("*").execute()
-    df_expenses = pd.DataFrame(response_exp.data)
 
-    # B. Fetch Debts & Friends (to get names instead of IDs)
-    response_debts = supabase.table("debts").select("*").execute()
-    response_friends = supabase.table("friends").select("id, name").execute()
+def sync_table(table, columns, force_full=False):
+    """Brings the cached DataFrame up to date, fetching only new rows when possible."""
+    store = get_table_store()
+    with store["lock"]:
+        entry = store["tables"].get(table)
+        now = time.monotonic()
 
-    df_debts = pd.DataFrame(response_debts.data)
-    df_friends = pd.DataFrame(response_friends.data)
+        if entry is not None and not force_full and now - entry["synced_at"] < MIN_SYNC_SECONDS:
+            return entry["df"]
 
-    # C. Merge Friend Names into Debts
+        if entry is None or force_full or now - entry["reconciled_at"] > FULL_RECONCILE_SECONDS:
+            df = pd.DataFrame(fetch_rows(table, columns))
+            entry = {"df": df, "reconciled_at": now}
+        else:
+            new_rows = fetch_rows(table, columns, after_id=entry["last_id"])
+            if new_rows:
+                entry["df"] = pd.concat([entry["df"], pd.DataFrame(new_rows)], ignore_index=True)
+
+        df = entry["df"]
+        entry["last_id"] = int(df["id"].max()) if not df.empty else 0
+        entry["synced_at"] = now
+        store["tables"][table] = entry
+        return df
+
+
+def load_debts(force_full=False):
+    """Returns Debts (with borrower names) from the incremental cache"""
+    df_debts = sync_table("debts", TABLES["debts"], force_full)
+    df_friends = sync_table("friends", TABLES["friends"], force_full)
+
+    # Merge Friend Names into Debts
     # We do this merge in Python because Supabase API joins are more complex
     if not df_debts.empty and not df_friends.empty:
         # Join 'debts' and 'friends' on borrower_id = id
-        df_debts = df_debts.merge(df_friends, left_on='borrower_id', right_on='id', how='left')
+        df_debts = df_debts.merge(df_friends.rename(columns={'id': 'friend_id'}),
+                                  left_on='borrower_id', right_on='friend_id', how='left')
         df_debts.rename(columns={'name': 'borrower_name'}, inplace=True)
 
-    return df_expenses, df_debts
+    return df_debts
+
+
+# --- 3. AGGREGATES ---
+# Metrics and charts only need sums, so Postgres computes them (sql/dashboard_aggregates.sql).
+# Without those functions the sums come from the incrementally cached expense rows instead;
+# any other error is raised (and not cached), so a transient failure is shown and retried.
+@st.cache_data(ttl=AUTO_REFRESH_SECONDS, show_spinner=False)
+def get_aggregates(start, end):
+    """Returns (daily, by_category) DataFrames for expenses between start and end (inclusive)."""
+    params = {"start_date": start.isoformat(), "end_date": end.isoformat()}
+    try:
+        daily = pd.DataFrame(supabase.rpc("get_daily_spend", params).execute().data,
+                             columns=["day", "total_spent", "healthy_spent", "item_count", "healthy_count"])
+        by_category = pd.DataFrame(supabase.rpc("get_category_spend", params).execute().data,
+                                   columns=["category", "health_status", "total_spent", "item_count"])
+    except Exception as e:
+        if not is_missing_function(e):
+            raise
+        daily, by_category = aggregate_cached(start, end)
+
+    daily["day"] = pd.to_datetime(daily["day"])
+    for col in ("total_spent", "healthy_spent"):
+        daily[col] = daily[col].astype(float)
+    by_category["total_spent"] = by_category["total_spent"].astype(float)
+    return daily, by_category
+
 
+def aggregate_cached(start, end):
+    """Fallback for get_aggregates(): same frames, computed from the cached rows."""
+    df = sync_table("expenses", TABLES["expenses"])
+    if df.empty:
+        return (pd.DataFrame(columns=["day", "total_spent", "healthy_spent", "item_count", "healthy_count"]),
+                pd.DataFrame(columns=["category", "health_status", "total_spent", "item_count"]))
 
-# --- 3. DASHBOARD LAYOUT ---
+    dates = pd.to_datetime(df["date"]).dt.date
+    df = df[(dates >= start) & (dates <= end)].assign(day=dates)
+    healthy = df["is_healthy"] == True  # noqa: E712 (None/NaN count as not healthy)
+    df = df.assign(healthy_spent=df["amount"].where(healthy, 0.0), healthy_count=healthy.astype(int),
+                   health_status=healthy.map({True: "Healthy", False: "Unhealthy"}),
+                   category=df["category"].fillna("General"))
+
+    daily = df.groupby("day").agg(total_spent=("amount", "sum"), healthy_spent=("healthy_spent", "sum"),
+                                  item_count=("amount", "size"), healthy_count=("healthy_count", "sum"))
+    by_category = df.groupby(["category", "health_status"]).agg(total_spent=("amount", "sum"),
+                                                                item_count=("amount", "size"))
+    return daily.reset_index(), by_category.reset_index()
+
+
+@st.cache_data(ttl=AUTO_REFRESH_SECONDS, show_spinner=False)
+def get_log_page(start, end, page):
+    """One page of expenses (newest first) and the total row count, via a range request."""
+    first = (page - 1) * LOG_PAGE_SIZE
+    res = supabase.table("expenses").select("date, item, amount, category", count="exact") \
+        .gte("date", start.isoformat()) \
+        .lte("date", end.isoformat()) \
+        .order("date", desc=True) \
+        .order("id", desc=True) \
+        .range(first, first + LOG_PAGE_SIZE - 1) \
+        .execute()
+    return pd.DataFrame(res.data, columns=["date", "item", "amount", "category"]), res.count or 0
+
+
+def downsample(daily):
+    """Cuts the daily series down to CHART_MAX_POINTS with LTTB (keeps spikes and dips)."""
+    if len(daily) <= CHART_MAX_POINTS:
+        return daily
+    keep = lttb(daily["day"].astype("int64").to_numpy(), daily["total_spent"].to_numpy(), CHART_MAX_POINTS)
+    return daily.iloc[keep]
+
+
+def refresh():
+    get_aggregates.clear()
+    get_log_page.clear()
+
+
+# --- 4. DASHBOARD LAYOUT ---
 st.set_page_config(page_title="FiscalFit Cloud", page_icon="☁️", layout="wide")
 
 st.title("☁️ FiscalFit: Cloud Dashboard")
 st.markdown("---")
 
-# Refresh Button
-if st.button('🔄 Refresh Cloud Data'):
-    st.rerun()
+# Refresh Buttons
+# 'Refresh' only pulls rows newer than the last seen id; 'Full Reload' re-downloads everything.
+b1, b2, b3 = st.columns([1, 1, 4])
+if b1.button('🔄 Refresh Cloud Data'):
+    with st.spinner("Fetching new rows from cloud..."):
+        refresh()
+        load_debts()
+if b2.button('♻️ Full Reload'):
+    with st.spinner("Fetching data from cloud..."):
+        refresh()
+        load_debts(force_full=True)
+        if "expenses" in get_table_store()["tables"]:
+            sync_table("expenses", TABLES["expenses"], force_full=True)
 
-# Load Data
-with st.spinner("Fetching data from cloud..."):
-    df_expenses, df_debts = load_data()
-
-# Check if we have data
-if df_expenses.empty:
-    st.warning("No expenses found in the cloud yet. Try logging some using the CLI or Agent!")
+today = date.today()
+picked = b3.date_input("📆 Date range", value=(today - timedelta(days=DEFAULT_RANGE_DAYS), today), max_value=today)
+# While the user is still picking, the widget holds only the start date
+if isinstance(picked, (list, tuple)):
+    start_date, end_date = (picked[0], picked[1]) if len(picked) == 2 else (picked[0], today)
 else:
-    # --- 4. TOP METRICS ROW ---
-    # Convert string dates to datetime objects for sorting
-    df_expenses['date'] = pd.to_datetime(df_expenses['date'])
+    start_date, end_date = picked, today
+
+
+# --- 5. TOP METRICS & CHARTS ---
+# Each panel is a fragment: it re-renders on its own timer without rerunning the page.
+@st.fragment(run_every=AUTO_REFRESH_SECONDS)
+def metrics_and_charts(start, end):
+    try:
+        daily, by_category = get_aggregates(start, end)
+    except Exception as e:
+        st.error(f"❌ Could not load spending totals: {e}")
+        return
+    df_debts = load_debts()
+
+    # Check if we have data
+    if daily.empty:
+        st.warning("No expenses found in this date range. Try logging some using the CLI or Agent!")
+        return
 
     # Calculate Total Spent
-    total_spent = df_expenses['amount'].sum()
+    total_spent = daily['total_spent'].sum()
 
-    # Calculate Health Score
-    # Count items where is_healthy is True
-    healthy_count = df_expenses[df_expenses['is_healthy'] == True].shape[0]
-    total_items = df_expenses.shape[0]
-    health_score = int((healthy_count / total_items) * 100) if total_items > 0 else 0
+    # Calculate Health Score (share of healthy items)
+    total_items = daily['item_count'].sum()
+    health_score = int((daily['healthy_count'].sum() / total_items) * 100) if total_items > 0 else 0
 
     # Calculate Active Debt (Money people owe you)
     total_owed = 0
@@ -94,41 +232,50 @@ else:
 
     st.markdown("---")
 
-    # --- 5. CHARTS ROW ---
+    # --- CHARTS ROW ---
     c1, c2 = st.columns(2)
 
     with c1:
         st.subheader("🥗 Healthy vs Unhealthy")
-        if 'is_healthy' in df_expenses.columns:
-            # Create a copy to map True/False to text labels
-            df_health = df_expenses.copy()
-            df_health['Health Status'] = df_health['is_healthy'].map({True: 'Healthy', False: 'Unhealthy'})
+        df_health = by_category.groupby('health_status', as_index=False)['total_spent'].sum()
+        df_health = df_health.rename(columns={'health_status': 'Health Status', 'total_spent': 'amount'})
 
-            # Pie Chart
-            fig_pie = px.pie(df_health, names='Health Status', values='amount',
-                             color='Health Status',
-                             color_discrete_map={'Healthy': '#2ecc71', 'Unhealthy': '#e74c3c'})
-            st.plotly_chart(fig_pie, use_container_width=True)
+        # Pie Chart
+        fig_pie = px.pie(df_health, names='Health Status', values='amount',
+                         color='Health Status',
+                         color_discrete_map={'Healthy': '#2ecc71', 'Unhealthy': '#e74c3c'})
+        st.plotly_chart(fig_pie, use_container_width=True)
 
     with c2:
         st.subheader("📅 Spending Trend")
-        # Group by date and sum amounts
-        daily_spend = df_expenses.groupby('date')['amount'].sum().reset_index()
+        points = downsample(daily)
         # Line Chart
-        fig_line = px.line(daily_spend, x='date', y='amount', markers=True)
+        fig_line = px.line(points, x='day', y='total_spent', markers=len(points) <= 120,
+                           labels={'day': 'date', 'total_spent': 'amount'})
         st.plotly_chart(fig_line, use_container_width=True)
+        if len(points) < len(daily):
+            st.caption(f"Showing {len(points)} of {len(daily)} days (LTTB downsampled).")
+
+
+# --- 6. DATA TABLES ---
+@st.fragment(run_every=AUTO_REFRESH_SECONDS)
+def data_tables(start, end):
+    df_debts = load_debts()
 
-    # --- 6. DATA TABLES ---
     c3, c4 = st.columns(2)
 
     with c3:
         st.subheader("📜 Recent Cloud Logs")
-        # Show specific columns, sorted by newest first
-        st.dataframe(
-            df_expenses[['date', 'item', 'amount', 'category']].sort_values(by='date', ascending=False),
-            use_container_width=True,
-            height=300
-        )
+        # Only the requested page is fetched and sent to the browser
+        page = st.session_state.get("log_page", 1)
+        df_page, total = get_log_page(start, end, page)
+        pages = max(1, -(-total // LOG_PAGE_SIZE))
+        if page > pages:
+            page = st.session_state["log_page"] = pages
+            df_page, total = get_log_page(start, end, page)
+
+        st.dataframe(df_page, use_container_width=True, height=300)
+        st.number_input(f"Page (of {pages}, {total} rows)", min_value=1, max_value=pages, key="log_page")
 
     with c4:
         st.subheader("📒 Active Debt Log")
@@ -142,4 +289,8 @@ else:
             else:
                 st.success("No active debts! Everyone is settled up.")
         else:
-            st.info("No debt records found in the cloud.")
\ No newline at end of file
+            st.info("No debt records found in the cloud.")
+
+
+metrics_and_charts(start_date, end_date)
+data_tables(start_date, end_date)
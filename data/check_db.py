@@ -2,8 +2,8 @@ import sqlite3
 import os
 
 # 1. Define the database file name
-# (Make sure this matches the filename inside modules/database.py)
-DB_NAME = "tracker.db"
+# (Make sure this matches DB_FILE inside modules/sqlite_backend.py, used with PYLIFE_BACKEND=sqlite)
+DB_NAME = os.getenv("PYLIFE_SQLITE_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "tracker.db"))
 
 def view_data():
     if not os.path.exists(DB_NAME):
@@ -11,6 +11,7 @@ def view_data():
         return
 
     conn = sqlite3.connect(DB_NAME)
+    conn.row_factory = sqlite3.Row
     cursor = conn.cursor()
 
     try:
@@ -24,9 +25,7 @@ def view_data():
             print(f"\n{'Date':<12} {'Item':<20} {'Amount':<10} {'Healthy?':<10}")
             print("-" * 60)
             for row in rows:
-                # Adjust indices [1], [2] etc based on your specific table columns
-                # Typically: id, date, item, amount, category, is_healthy
-                print(f"{row[1]:<12} {row[2]:<20} {row[3]:<10} {row[5]}")
+                print(f"{row['date']:<12} {row['item']:<20} {row['amount']:<10} {row['is_healthy']}")
 
     except sqlite3.Error as e:
         print(f"❌ SQL Error: {e}")
@@ -2,6 +2,8 @@ import os
 from dotenv import load_dotenv
 from supabase import create_client, Client
 from datetime import date
+# Name resolution goes through the shared (cached) friend directory
+from modules.social_manager import get_friend_id
 
 # --- 1. CONFIGURATION & SETUP ---
 load_dotenv()
@@ -15,36 +17,7 @@ if not url or not key:
 supabase: Client = create_client(url, key)
 
 
-# --- 2. HELPER FUNCTIONS ---
-
-def normalize_name(name):
-    """Standardizes text to lowercase/stripped for comparison."""
-    if not name: return ""
-    return str(name).strip().lower()
-
-
-def get_friend_id(name):
-    """Resolves name to ID. Handles 'Me' -> Fetches 'Me' ID from DB."""
-    clean_name = normalize_name(name)
-
-    # Handle Self (User) keywords
-    if clean_name in ["me", "i", "myself", "user", "self", "you"]:
-        print(f"   -> Detected keyword '{name}', switching search to 'Me'...")
-        clean_name = normalize_name("Me")
-
-    # Query Database
-    try:
-        response = supabase.table("friends").select("id, name").execute()
-        for f in response.data:
-            if normalize_name(f['name']) == clean_name:
-                return f['id']
-    except Exception as e:
-        print(f"   -> Error looking up friend: {e}")
-
-    return None
-
-
-# --- 3. MAIN EXECUTION ---
+# --- 2. MAIN EXECUTION ---
 
 if __name__ == "__main__":
     # Input Data
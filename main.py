@@ -1,7 +1,12 @@
 import argparse
-from modules import finance_manager, social_manager, report_generator, ocr_handler
 
 # Note: We removed 'initialize_db' because Supabase tables are already created online.
+# Modules are imported inside each command so a command only pays for what it uses
+# (e.g. list_friends never loads Pillow/pytesseract). The Supabase client itself is
+# created on first use, see modules/database.py.
+
+# Same as report_generator.EXPORT_FORMATS (kept here so --help doesn't import it)
+EXPORT_FORMATS = ("xlsx", "csv", "jsonl", "parquet")
 
 def main():
     # Initialize the parser
@@ -16,6 +21,12 @@ def main():
     parser_exp.add_argument("--cat", type=str, default="General", help="Category (e.g., Food)")
     parser_exp.add_argument("--healthy", type=int, choices=[0, 1], help="1 for Healthy, 0 for Unhealthy (Optional)")
 
+    # --- COMMAND: log_expenses_batch ---
+    # Usage: python main.py log_expenses_batch "Burger=120" "Salad=90" --cat Food
+    parser_batch = subparsers.add_parser("log_expenses_batch", help="Log many expenses at once")
+    parser_batch.add_argument("items", type=str, nargs="+", help="Entries as Item=Amount")
+    parser_batch.add_argument("--cat", type=str, default="General", help="Category for all items")
+
     # --- COMMAND: add_friend ---
     parser_friend = subparsers.add_parser("add_friend", help="Register a new friend")
     parser_friend.add_argument("name", type=str, help="Friend's name")
@@ -34,10 +45,56 @@ def main():
     parser_pay.add_argument("receiver", type=str, help="Who is receiving")
     parser_pay.add_argument("amount", type=float, help="Amount paid")
 
+    # --- COMMAND: split_expense ---
+    # Usage: python main.py split_expense Me 600 Me Pratham Rahul --desc Pizza --weights 2 1 1
+    parser_split = subparsers.add_parser("split_expense", help="Split a bill between friends")
+    parser_split.add_argument("payer", type=str, help="Who paid")
+    parser_split.add_argument("total", type=float, help="Bill total")
+    parser_split.add_argument("participants", type=str, nargs="+", help="Everyone who shared (incl. payer)")
+    parser_split.add_argument("--desc", type=str, default="Split Bill", help="Description")
+    parser_split.add_argument("--weights", type=float, nargs="+", help="One weight per participant")
+    parser_split.add_argument("--cat", type=str, default="Food", help="Category for your own share")
+    parser_split.add_argument("--healthy", type=int, choices=[0, 1], help="1 for Healthy, 0 for Unhealthy (Optional)")
+
     # --- COMMAND: report ---
     parser_rep = subparsers.add_parser("report", help="Generate monthly graphs & data")
     parser_rep.add_argument("--month", type=int, help="Month number (1-12)")
     parser_rep.add_argument("--year", type=int, help="Year (e.g., 2023)")
+    parser_rep.add_argument("--from", dest="start", type=str, help="Range start month YYYY-MM")
+    parser_rep.add_argument("--to", dest="end", type=str, help="Range end month YYYY-MM (with --from)")
+
+    # --- COMMAND: export ---
+    # Usage: python main.py export --format csv
+    parser_export = subparsers.add_parser("export", help="Export all tables to reports/")
+    parser_export.add_argument("--format", type=str, default="xlsx",
+                               choices=list(EXPORT_FORMATS), help="Output format")
+
+    # --- COMMAND: rebuild_rollups ---
+    subparsers.add_parser("rebuild_rollups", help="Recompute monthly spending rollups from the cloud")
+
+    # --- COMMAND: rebuild_fitness ---
+    subparsers.add_parser("rebuild_fitness", help="Recompute daily gym/protein buckets from the cloud")
+
+    # --- COMMAND: snapshot ---
+    # Usage: python main.py snapshot --sql "SELECT category, SUM(amount) FROM expenses GROUP BY 1"
+    parser_snap = subparsers.add_parser("snapshot", help="Sync the local Parquet snapshot (and query it)")
+    parser_snap.add_argument("--full", action="store_true", help="Re-copy every table instead of syncing changes")
+    parser_snap.add_argument("--sql", type=str, help="Read-only SQL to run locally with DuckDB")
+
+    # --- COMMAND: import_statement ---
+    # Usage: python main.py import_statement statement.csv --dry-run
+    parser_imp = subparsers.add_parser("import_statement", help="Import expenses from a bank statement")
+    parser_imp.add_argument("path", type=str, help="CSV, OFX/QFX or QIF statement file")
+    parser_imp.add_argument("--format", type=str, choices=["csv", "ofx", "qif"], help="Default: from the extension")
+    parser_imp.add_argument("--cat", type=str, default="General", help="Category for unrecognised merchants")
+    parser_imp.add_argument("--sign", type=str, default="negative", choices=["negative", "positive"],
+                            help="CSV single amount column: which sign means money spent")
+    date_order = parser_imp.add_mutually_exclusive_group()
+    date_order.add_argument("--month-first", dest="month_first", action="store_true", default=None,
+                            help="Dates are MM/DD (default for QIF)")
+    date_order.add_argument("--day-first", dest="month_first", action="store_false",
+                            help="Dates are DD/MM (default for CSV)")
+    parser_imp.add_argument("--dry-run", action="store_true", help="Parse and report without writing")
 
     # --- COMMAND: list_friends ---
     subparsers.add_parser("list_friends", help="Show all registered friends")
@@ -46,11 +103,18 @@ def main():
     parser_scan = subparsers.add_parser("scan_receipt", help="OCR a receipt image")
     parser_scan.add_argument("path", type=str, help="Path to image file")
 
+    # --- COMMAND: scan_receipts ---
+    parser_scan_dir = subparsers.add_parser("scan_receipts", help="OCR every receipt image in a folder")
+    parser_scan_dir.add_argument("folder", type=str, help="Folder with receipt images")
+    parser_scan_dir.add_argument("--workers", type=int, help="Parallel processes (default: all cores)")
+
     # Parse arguments
     args = parser.parse_args()
 
     # Route to the correct function
     if args.command == "log_expense":
+        from modules import finance_manager
+
         # Convert integer 1/0 to Boolean if provided
         is_healthy = bool(args.healthy) if args.healthy is not None else None
 
@@ -82,31 +146,151 @@ def main():
         else:
             print(f"❌ {result.get('message', 'Unknown Error')}")
 
+    elif args.command == "log_expenses_batch":
+        from modules import finance_manager
+
+        entries = []
+        for raw in args.items:
+            item, sep, amount = raw.rpartition("=")
+            if not sep or not item.strip():
+                print(f"❌ Invalid entry '{raw}'. Use Item=Amount (e.g. Burger=120).")
+                return
+            try:
+                entries.append({"item": item.strip(), "amount": float(amount)})
+            except ValueError:
+                print(f"❌ Invalid amount in '{raw}'.")
+                return
+
+        # 1. Log everything we already know in one go
+        result = finance_manager.log_expenses_batch(entries, args.cat)
+        print(f"✅ {result['message']}" if result.get("status") != "ERROR" else f"❌ {result['message']}")
+
+        # 2. One clarification round for all unknown items
+        if result.get("status") == "NEEDS_CLARIFICATION":
+            retry = []
+            for u in result["unknown"]:
+                print(f"\n❓ Unknown Item: '{u['item']}'")
+                print("   Is this Healthy (1) or Unhealthy (0)?")
+                while True:
+                    user_choice = input("   Enter 1 or 0: ").strip()
+                    if user_choice in ['1', '0']:
+                        is_healthy_bool = (user_choice == '1')
+                        finance_manager.learn_item_health(u['item'], is_healthy_bool)
+                        retry.append({"item": u['item'], "amount": u['amount'], "is_healthy": is_healthy_bool})
+                        break
+                    else:
+                        print("   Invalid input. Please enter 1 for Healthy or 0 for Unhealthy.")
+
+            print("   Saving to Cloud...")
+            result = finance_manager.log_expenses_batch(retry, args.cat)
+            print(f"✅ {result['message']}" if result.get("status") == "SUCCESS" else f"❌ {result['message']}")
+
     elif args.command == "add_friend":
+        from modules import social_manager
+
         # Now returns a string, so we print it
         print(social_manager.add_friend(args.name, args.phone))
 
     elif args.command == "log_debt":
+        from modules import social_manager
         res = social_manager.log_debt(args.borrower, args.lender, args.amount, args.desc)
         print(res)
 
     elif args.command == "record_payment":
+        from modules import social_manager
         res = social_manager.record_payment(args.payer, args.receiver, args.amount)
         print(res)
 
+    elif args.command == "split_expense":
+        from modules import finance_manager, social_manager
+
+        is_healthy = bool(args.healthy) if args.healthy is not None else None
+        res = social_manager.split_expense(args.payer, args.total, args.participants,
+                                           args.desc, args.weights, args.cat, is_healthy)
+        if res.startswith("NEEDS_CLARIFICATION"):
+            print(f"\n❓ Unknown Item: '{args.desc}'")
+            while True:
+                user_choice = input("   Is this Healthy (1) or Unhealthy (0)? ").strip()
+                if user_choice in ['1', '0']:
+                    is_healthy = (user_choice == '1')
+                    finance_manager.learn_item_health(args.desc, is_healthy)
+                    res = social_manager.split_expense(args.payer, args.total, args.participants,
+                                                       args.desc, args.weights, args.cat, is_healthy)
+                    break
+                print("   Invalid input. Please enter 1 for Healthy or 0 for Unhealthy.")
+        print(res)
+
     elif args.command == "report":
-        # Now returns the summary text, so we print it
-        print(report_generator.generate_monthly_report(args.month, args.year))
+        from modules import report_generator
+
+        # Summary text comes back right away; the Excel file is built in the background
+        if args.start:
+            print(report_generator.generate_range_report(args.start, args.end or args.start))
+        else:
+            print(report_generator.generate_monthly_report(args.month, args.year))
+            print(report_generator.wait_for_export())
+
+    elif args.command == "export":
+        from modules import report_generator
+        print(report_generator.export_data(args.format))
+
+    elif args.command == "rebuild_rollups":
+        from modules import rollups
+        print(rollups.rebuild())
+
+    elif args.command == "rebuild_fitness":
+        from modules import fitness_series
+        print(fitness_series.rebuild())
+
+    elif args.command == "snapshot":
+        from modules import snapshot
+
+        try:
+            if args.sql:
+                if args.full:
+                    snapshot.sync(full=True)
+                columns, rows = snapshot.query(args.sql)
+                print(" | ".join(columns))
+                for row in rows:
+                    print(" | ".join(str(v) for v in row))
+            else:
+                fetched = snapshot.sync(full=args.full)
+                print(f"✅ Snapshot synced ({sum(fetched.values())} rows fetched):")
+                print(snapshot.describe())
+        except Exception as e:
+            print(f"❌ Snapshot Error: {e}")
+
+    elif args.command == "import_statement":
+        from modules import statement_importer
+
+        def show_progress(stats):
+            print(f"   {stats['percent']:5.1f}% | {stats['read']} rows read, {stats['imported']} imported, "
+                  f"{stats['duplicates']} duplicates", flush=True)
+
+        print(statement_importer.import_statement(args.path, args.format, args.cat, args.sign,
+                                                  args.month_first, args.dry_run, show_progress))
 
     elif args.command == "list_friends":
+        from modules import social_manager
+
         friends = social_manager.list_friends()
         print("--- Friends List (Cloud) ---")
         for f in friends:
             print(f"- {f}")
 
     elif args.command == "scan_receipt":
+        from modules import ocr_handler
         ocr_handler.scan_receipt(args.path)
 
+    elif args.command == "scan_receipts":
+        from modules import ocr_handler
+
+        results = ocr_handler.scan_receipts(args.folder, args.workers)
+        for path, text in results.items():
+            print(f"--- {path} ---")
+            print(text)
+        print(f"🧾 Scanned {len(results)} file(s).")
+
     else:
         parser.print_help()
 
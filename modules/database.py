@@ -1,6 +1,7 @@
 import os
-from supabase import create_client, Client
+import threading
 from dotenv import load_dotenv
+from modules.instrumentation import InstrumentedClient
 
 # 1. Load environment variables
 load_dotenv()
@@ -8,108 +9,97 @@ load_dotenv()
 url = os.getenv("SUPABASE_URL")
 key = os.getenv("SUPABASE_KEY")
 
-if not url or not key:
-    raise ValueError("❌ Supabase credentials missing! Please check your .env file.")
+# "supabase" (default) or "sqlite" for a fully local database (see modules/sqlite_backend.py)
+BACKEND = os.getenv("PYLIFE_BACKEND", "supabase").lower()
+
+# 2. Supabase Client
+# Created on the first get_client() call: importing supabase (httpx, postgrest, auth...)
+# costs ~0.5 s, which commands that never touch the cloud shouldn't pay.
+# Every request made through get_client() is timed and counted (see modules/instrumentation.py)
+supabase = None
+_instrumented = None
+_client_lock = threading.Lock()
+
+
+def _connect():
+    if BACKEND == "sqlite":
+        from modules.sqlite_backend import SQLiteClient
+        return SQLiteClient()
+
+    from supabase import create_client
+
+    if not url or not key:
+        raise ValueError("❌ Supabase credentials missing! Please check your .env file.")
+    return create_client(url, key)
 
-# 2. Initialize Supabase Client
-supabase: Client = create_client(url, key)
 
 def get_client():
     """Returns the authenticated Supabase client instance."""
-    return supabase
-
-# def get_connection():
-#     """Establishes a connection to the SQLite database."""
-#     # Ensure the data folder exists
-#     if not os.path.exists(DB_FOLDER):
-#         os.makedirs(DB_FOLDER)
-#
-#     conn = sqlite3.connect(DB_FILE)
-#     # This allows us to access columns by name (row['id']) instead of index (row[0])
-#     conn.row_factory = sqlite3.Row
-#     return conn
-#
-#
-# def initialize_db():
-#     """Creates the necessary tables if they do not exist."""
-#     conn = get_connection()
-#     cursor = conn.cursor()
-#
-#     # 1. Create FRIENDS Table
-#     cursor.execute('''
-#     CREATE TABLE IF NOT EXISTS friends (
-#         id INTEGER PRIMARY KEY AUTOINCREMENT,
-#         name TEXT UNIQUE NOT NULL,
-#         phone TEXT
-#     )
-#     ''')
-#
-#     # 2. Create EXPENSES Table
-#     cursor.execute('''
-#     CREATE TABLE IF NOT EXISTS expenses (
-#         id INTEGER PRIMARY KEY AUTOINCREMENT,
-#         date TEXT NOT NULL,
-#         item TEXT NOT NULL,
-#         amount REAL NOT NULL,
-#         category TEXT,
-#         is_healthy BOOLEAN
-#     )
-#     ''')
-#
-#     # 3. Create DEBTS Table (Tracks the original borrowing event)
-#     cursor.execute('''
-#     CREATE TABLE IF NOT EXISTS debts (
-#         id INTEGER PRIMARY KEY AUTOINCREMENT,
-#         date TEXT NOT NULL,
-#         borrower_id INTEGER NOT NULL,
-#         lender_id INTEGER NOT NULL,
-#         amount REAL NOT NULL,
-#         description TEXT,
-#         status TEXT DEFAULT 'Active',
-#         FOREIGN KEY (borrower_id) REFERENCES friends (id),
-#         FOREIGN KEY (lender_id) REFERENCES friends (id)
-#     )
-#     ''')
-#
-#     # 4. Create PAYMENTS Table (Tracks paybacks)
-#     cursor.execute('''
-#     CREATE TABLE IF NOT EXISTS payments (
-#         id INTEGER PRIMARY KEY AUTOINCREMENT,
-#         date TEXT NOT NULL,
-#         debt_id INTEGER NOT NULL,
-#         payer_id INTEGER NOT NULL,
-#         amount REAL NOT NULL,
-#         FOREIGN KEY (debt_id) REFERENCES debts (id),
-#         FOREIGN KEY (payer_id) REFERENCES friends (id)
-#     )
-#     ''')
-#
-#     conn.commit()
-#     conn.close()
-#     print(f"Database initialized successfully at: {DB_FILE}")
-#
-#
-# # Helper function to run simple queries safely
-# # Updated Helper function
-# # Helper function to run simple queries safely
-# def execute_query(query, params=(), fetch=False):
-#     conn = get_connection()
-#     cursor = conn.cursor()
-#     try:
-#         cursor.execute(query, params)
-#         if fetch:
-#             result = cursor.fetchall()
-#             return result
-#         else:
-#             conn.commit()
-#             return cursor.lastrowid
-#     except sqlite3.Error as e:
-#         print(f"❌ Database Error: {e}")
-#         return None
-#     finally:
-#         conn.close()
-#
-#
-# # If this file is run directly, initialize the DB
-# if __name__ == "__main__":
-#     initialize_db()
\ No newline at end of file
+    global supabase, _instrumented
+    if _instrumented is None:
+        with _client_lock:
+            if _instrumented is None:
+                supabase = _connect()
+                _instrumented = InstrumentedClient(supabase)
+    return _instrumented
+
+
+def set_client(client):
+    """Swaps the client used by every module (benchmarks, local stand-ins)."""
+    global supabase, _instrumented
+    with _client_lock:
+        supabase = client
+        _instrumented = InstrumentedClient(client)
+
+
+PAGE_SIZE = 1000  # PostgREST's default max rows per response
+
+
+def iter_pages(table, columns="*", page_size=PAGE_SIZE, query=None):
+    """
+    Yields a table page by page (ordered by id) using range requests,
+    so large tables are never truncated at the PostgREST row limit.
+    'query' can narrow the select, e.g. lambda q: q.gte("date", "2024-01-01").
+    """
+    start = 0
+    while True:
+        builder = get_client().table(table).select(columns)
+        if query is not None:
+            builder = query(builder)
+        page = builder.order("id").range(start, start + page_size - 1).execute().data
+        if page:
+            yield page
+        if len(page) < page_size:
+            return
+        start += page_size
+
+
+# 3. Table Versions
+# Bumped by every write path in this process so read caches know when to drop results.
+_table_versions = {}
+
+
+def bump_table_version(*tables):
+    """Marks tables as changed."""
+    for table in tables:
+        _table_versions[table] = _table_versions.get(table, 0) + 1
+
+
+def get_table_version(table):
+    """Returns how many times a table has been written by this process."""
+    return _table_versions.get(table, 0)
+
+
+# 4. Error Classification
+# PostgREST errors carry a code; the local stand-ins (sqlite_backend, benchmarks) reuse its messages.
+def is_missing_function(error):
+    """True if an RPC failed because the function isn't deployed (PGRST202)."""
+    return getattr(error, "code", None) == "PGRST202" or "Could not find the function" in str(error)
+
+
+def is_missing_column(error):
+    """True if a query failed because a column doesn't exist (42703 / PGRST204)."""
+    if getattr(error, "code", None) in ("42703", "PGRST204"):
+        return True
+    message = str(error)
+    return "column" in message and "does not exist" in message
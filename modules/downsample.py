@@ -0,0 +1,36 @@
+import numpy as np
+
+# --- CHART DOWNSAMPLING ---
+# Largest-Triangle-Three-Buckets (Steinarsson, 2013): keeps the points that carry the
+# visual shape of a line (peaks, dips) while cutting it down to roughly one per pixel.
+
+
+def lttb(x, y, threshold):
+    """
+    Downsamples a series to 'threshold' points; returns the indices to keep (sorted).
+    x must be numeric and ascending (convert dates with .astype('int64') first).
+    The first and last points are always kept.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    keep = np.empty(threshold, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+
+    # Everything between the end points is split into threshold - 2 buckets
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        # Average of the next bucket (or the last point) is the triangle's third corner
+        next_start, next_end = end, (edges[i + 2] if i + 2 < len(edges) else n)
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(area.argmax())
+        keep[i + 1] = a
+    return keep
@@ -1,37 +1,183 @@
+import json
+import os
+import threading
+from collections import OrderedDict
 from datetime import date
-from modules.database import get_client
+from modules.database import get_client, bump_table_version
+from modules import rollups, write_journal
+from modules.fuzzy_index import TrigramIndex
+
+# --- CONFIGURATION ---
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
+HEALTH_SEED_FILE = os.path.join(PROJECT_ROOT, 'data', 'item_health.json')
+
+# --- ITEM HEALTH CACHE ---
+# Bounded LRU of normalized item -> is_healthy, so known items need no network call.
+HEALTH_CACHE_SIZE = 5000
+
+_health_cache = OrderedDict()
+_health_cache_lock = threading.Lock()
+
+# Every item we have ever seen, for "did you mean ...?" suggestions
+_item_trigrams = TrigramIndex()
+
+# Set once the cache has been warmed (see _ensure_preloaded)
+_preloaded = False
+_preload_lock = threading.Lock()
+
+
+def normalize_item(item):
+    """Standardize item names to lowercase/stripped."""
+    if not item: return ""
+    return str(item).lower().strip()
+
+
+def _cache_health(item, is_healthy):
+    """Stores an item in the LRU, evicting the least recently used entry."""
+    key = normalize_item(item)
+    with _health_cache_lock:
+        _health_cache[key] = is_healthy
+        _health_cache.move_to_end(key)
+        while len(_health_cache) > HEALTH_CACHE_SIZE:
+            _health_cache.popitem(last=False)
+    _item_trigrams.add(key, is_healthy)
+
+
+def _cached_health(item):
+    """Returns the cached status (True/False) or None if the item is unknown."""
+    key = normalize_item(item)
+    with _health_cache_lock:
+        if key in _health_cache:
+            _health_cache.move_to_end(key)
+            return _health_cache[key]
+    return None
+
+
+def suggest_items(item, limit=3):
+    """Known items that look like 'item' (typos, plurals): [(item, is_healthy), ...]"""
+    _ensure_preloaded()
+    key = normalize_item(item)
+    return [(name, healthy) for name, healthy, _ in _item_trigrams.search(key, limit) if name != key]
+
+
+def preload_item_health():
+    """
+    Warms the cache from the local seed (data/item_health.json) and the
+    cloud 'item_health' table. Cloud answers win over the seed.
+    """
+    global _preloaded
+    _preloaded = True
+    loaded = 0
+
+    # 1. Local seed knowledge base
+    try:
+        with open(HEALTH_SEED_FILE, encoding="utf-8") as f:
+            for item, is_healthy in json.load(f).items():
+                _cache_health(item, is_healthy)
+                loaded += 1
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Could not read health seed: {e}")
+
+    # 2. Everything the cloud brain has learned so far
+    try:
+        response = get_client().table("item_health").select("item, is_healthy").execute()
+        for row in response.data:
+            _cache_health(row['item'], row['is_healthy'])
+            loaded += 1
+    except Exception as e:
+        print(f"⚠️ Could not preload item health from cloud: {e}")
+
+    return loaded
+
+
+def _ensure_preloaded():
+    """
+    Warms the cache on the first health lookup in this process, whatever the
+    entry point (server.py, 'mcp run', the CLI), so known items never need a prompt.
+    """
+    if not _preloaded:
+        with _preload_lock:
+            if not _preloaded:
+                preload_item_health()
 
 
 # --- CORE FUNCTIONS (Cloud Version) ---
 
 def check_item_health(item):
-    """Checks Cloud DB for item health status."""
+    """Checks the local cache, then the Cloud DB, for item health status."""
+    _ensure_preloaded()
+    cached = _cached_health(item)
+    if cached is not None:
+        return cached
+
     supabase = get_client()
     try:
         # Search for the item (case-insensitive)
         # .ilike ensures we find "Burger" even if you search "burger"
         response = supabase.table("item_health").select("is_healthy").ilike("item", item.strip()).execute()
         if response.data:
-            return response.data[0]['is_healthy']
+            is_healthy = response.data[0]['is_healthy']
+            _cache_health(item, is_healthy)
+            return is_healthy
     except Exception:
         pass
     return None
 
 
+def check_items_health(items):
+    """
+    Resolves health for many items at once.
+    Cached items cost nothing; the rest are fetched in ONE query.
+    Returns {normalized_item: True/False} for every known item.
+    """
+    _ensure_preloaded()
+    known = {}
+    missing = []
+    for item in {normalize_item(i) for i in items if i}:
+        cached = _cached_health(item)
+        if cached is not None:
+            known[item] = cached
+        else:
+            missing.append(item)
+
+    if missing:
+        supabase = get_client()
+        try:
+            response = supabase.table("item_health").select("item, is_healthy").in_("item", missing).execute()
+            for row in response.data:
+                _cache_health(row['item'], row['is_healthy'])
+                known[normalize_item(row['item'])] = row['is_healthy']
+        except Exception as e:
+            print(f"Error checking items: {e}")
+
+    return known
+
+
 def learn_item_health(item, is_healthy):
-    """Saves item health status to Cloud DB."""
+    """Saves item health status to Cloud DB (write-through to the local cache)."""
     supabase = get_client()
     try:
-        clean_item = item.lower().strip()
+        clean_item = normalize_item(item)
         data = {"item": clean_item, "is_healthy": is_healthy}
 
         # 'upsert' means: Insert if new, Update if exists
         supabase.table("item_health").upsert(data, on_conflict="item").execute()
+        bump_table_version("item_health")
+        _cache_health(clean_item, is_healthy)
         print(f"🧠 Cloud Brain: Learned that '{clean_item}' is {'Healthy' if is_healthy else 'Unhealthy'}")
     except Exception as e:
         print(f"Error learning item: {e}")
 
 
+def update_rollups(rows):
+    """Keeps the monthly rollups in step with new expenses (never blocks the log itself)."""
+    try:
+        rollups.record_expenses(rows)
+    except Exception as e:
+        print(f"⚠️ Could not update spending rollups: {e}")
+
+
 def log_expense(item, amount, category="Food", is_healthy=None):
     """Logs a personal expense to Supabase."""
 
@@ -45,11 +191,11 @@ def log_expense(item, amount, category="Food", is_healthy=None):
             return {
                 "status": "NEEDS_CLARIFICATION",
                 "item": item,
-                "amount": amount
+                "amount": amount,
+                "suggestions": suggest_items(item)
             }
 
-    # 2. Supabase Insert
-    supabase = get_client()
+    # 2. Supabase Insert (or local journal in offline mode)
     today = date.today().strftime("%Y-%m-%d")
 
     data = {
@@ -61,11 +207,70 @@ def log_expense(item, amount, category="Food", is_healthy=None):
     }
 
     try:
-        # .insert() sends data to the cloud 'expenses' table
-        supabase.table("expenses").insert(data).execute()
+        # Sends data to the cloud 'expenses' table (queued locally in offline mode)
+        write_journal.insert("expenses", data)
+        update_rollups([data])
 
         health_str = "Healthy" if is_healthy else "Unhealthy"
         return {"status": "SUCCESS", "message": f"☁️ Logged to Cloud: {item} (₹{amount}) as {health_str}"}
 
     except Exception as e:
-        return {"status": "ERROR", "message": f"Supabase Error: {str(e)}"}
\ No newline at end of file
+        return {"status": "ERROR", "message": f"Supabase Error: {str(e)}"}
+
+
+def log_expenses_batch(entries, category="Food"):
+    """
+    Logs many expenses (e.g. a whole receipt) with one health lookup and one insert.
+
+    Args:
+        entries: list of dicts like {"item": "Burger", "amount": 120,
+                 "category": "Food" (optional), "is_healthy": None (optional)}
+
+    Known items are saved immediately; unknown items are returned together
+    so the user only has to answer ONE clarification round.
+    """
+    # 1. Resolve health for every unique unknown item in one go
+    lookup = [e['item'] for e in entries if e.get('is_healthy') is None]
+    known = check_items_health(lookup) if lookup else {}
+
+    today = date.today().strftime("%Y-%m-%d")
+    rows = []
+    unknown = []
+
+    for e in entries:
+        is_healthy = e.get('is_healthy')
+        if is_healthy is None:
+            is_healthy = known.get(normalize_item(e['item']))
+
+        if is_healthy is None:
+            unknown.append({"item": e['item'], "amount": e['amount']})
+            continue
+
+        rows.append({
+            "date": today,
+            "item": e['item'],
+            "amount": e['amount'],
+            "category": e.get('category') or category,
+            "is_healthy": is_healthy
+        })
+
+    # 2. Bulk insert everything we could classify
+    if rows:
+        try:
+            write_journal.insert("expenses", rows)
+        except Exception as e:
+            return {"status": "ERROR", "message": f"Supabase Error: {str(e)}", "logged": [], "unknown": unknown}
+        update_rollups(rows)
+
+    total = sum(float(r['amount']) for r in rows)
+    message = f"☁️ Logged {len(rows)} item(s) to Cloud (₹{total:,.2f})"
+
+    if unknown:
+        return {
+            "status": "NEEDS_CLARIFICATION",
+            "message": message,
+            "logged": rows,
+            "unknown": unknown
+        }
+
+    return {"status": "SUCCESS", "message": message, "logged": rows, "unknown": []}
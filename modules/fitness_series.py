@@ -0,0 +1,283 @@
+import os
+import sqlite3
+import threading
+from datetime import date, datetime, timedelta
+from modules.database import iter_pages
+
+# --- CONFIGURATION ---
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
+FITNESS_FILE = os.path.join(PROJECT_ROOT, 'data', 'fitness.db')
+
+WINDOWS = (7, 30, 90, 365)
+
+_initialized = False
+_init_lock = threading.Lock()
+
+# --- IN-MEMORY SERIES ---
+# One slot per calendar day from the first recorded day to today, plus prefix sums,
+# so any "last N days" total is prefix[end] - prefix[end - N] (constant time).
+_lock = threading.Lock()
+_loaded = False
+_start = None             # date of slot 0
+_sessions = []            # gym sessions per day
+_protein = []             # protein grams per day
+_prefix_sessions = [0]    # len(_sessions) + 1 entries
+_prefix_gym_days = [0]
+_prefix_protein = [0.0]
+_runs = []                # consecutive gym days ending at each day
+_longest = 0
+
+
+def _connect():
+    conn = sqlite3.connect(FITNESS_FILE, timeout=10)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    return conn
+
+
+def initialize_series():
+    """Creates the daily bucket tables if they do not exist."""
+    global _initialized
+    with _init_lock:
+        if _initialized:
+            return
+        os.makedirs(os.path.dirname(FITNESS_FILE), exist_ok=True)
+        conn = _connect()
+        try:
+            conn.execute('''
+            CREATE TABLE IF NOT EXISTS fitness_days (
+                day TEXT PRIMARY KEY,
+                sessions INTEGER NOT NULL DEFAULT 0,
+                protein_g REAL NOT NULL DEFAULT 0
+            )
+            ''')
+            conn.execute('''
+            CREATE TABLE IF NOT EXISTS fitness_meta (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            )
+            ''')
+            conn.commit()
+            _initialized = True
+        finally:
+            conn.close()
+
+
+def _reset():
+    global _loaded, _start, _sessions, _protein, _prefix_sessions, _prefix_gym_days, _prefix_protein, _runs, _longest
+    _loaded = False
+    _start = None
+    _sessions, _protein, _runs = [], [], []
+    _prefix_sessions, _prefix_gym_days, _prefix_protein = [0], [0], [0.0]
+    _longest = 0
+
+
+def _append_day(sessions, protein):
+    global _longest
+    _sessions.append(sessions)
+    _protein.append(protein)
+    _prefix_sessions.append(_prefix_sessions[-1] + sessions)
+    _prefix_gym_days.append(_prefix_gym_days[-1] + (1 if sessions > 0 else 0))
+    _prefix_protein.append(_prefix_protein[-1] + protein)
+    run = ((_runs[-1] if _runs else 0) + 1) if sessions > 0 else 0
+    _runs.append(run)
+    _longest = max(_longest, run)
+
+
+def _extend_through(day):
+    """Adds empty days up to and including 'day'."""
+    global _start
+    if _start is None:
+        _start = day
+    while _start + timedelta(days=len(_sessions)) <= day:
+        _append_day(0, 0.0)
+
+
+def _load():
+    """Reads the daily buckets into memory (once per process, or after a rebuild)."""
+    global _loaded, _start
+    if _loaded:
+        return
+    initialize_series()
+    _reset()
+    conn = _connect()
+    try:
+        rows = conn.execute("SELECT day, sessions, protein_g FROM fitness_days ORDER BY day").fetchall()
+    finally:
+        conn.close()
+    if rows:
+        _start = date.fromisoformat(rows[0]['day'])
+    for row in rows:
+        _extend_through(date.fromisoformat(row['day']) - timedelta(days=1))
+        _append_day(row['sessions'], float(row['protein_g']))
+    _loaded = True
+
+
+def _record(day, sessions=0, protein=0.0):
+    """Adds to one day's bucket on disk and in memory."""
+    global _longest
+    day = day or date.today()
+    initialize_series()
+    # Held across the write so a concurrent _load() can't count this entry twice
+    with _lock:
+        conn = _connect()
+        try:
+            conn.execute('''
+                INSERT INTO fitness_days (day, sessions, protein_g) VALUES (?, ?, ?)
+                ON CONFLICT (day) DO UPDATE SET
+                    sessions = sessions + excluded.sessions,
+                    protein_g = protein_g + excluded.protein_g
+            ''', (day.isoformat(), sessions, protein))
+            conn.commit()
+        finally:
+            conn.close()
+
+        if not _loaded:
+            return
+        if _start is not None and day < _start + timedelta(days=len(_sessions) - 1):
+            # Back-dated entry: cheaper to reload than to patch every later prefix
+            _reset()
+            return
+        _extend_through(day)
+        was_gym_day = _sessions[-1] > 0
+        _sessions[-1] += sessions
+        _protein[-1] += protein
+        _prefix_sessions[-1] += sessions
+        _prefix_protein[-1] += protein
+        if not was_gym_day and _sessions[-1] > 0:
+            _prefix_gym_days[-1] += 1
+            _runs[-1] = (_runs[-2] if len(_runs) > 1 else 0) + 1
+            _longest = max(_longest, _runs[-1])
+
+
+def record_workout(day=None):
+    """Counts one gym session (called by log_workout)."""
+    _record(day, sessions=1)
+
+
+def record_protein(grams, day=None):
+    """Adds protein grams to a day (called by log_protein_intake)."""
+    _record(day, protein=float(grams))
+
+
+def _day_of(value):
+    """
+    Local calendar day of a created_at timestamp. Live writes bucket by the local
+    date.today(), so a UTC timestamp near midnight must land on the same day here.
+    Naive timestamps (the SQLite backend stores local time) are taken as local.
+    """
+    stamp = datetime.fromisoformat(str(value))
+    if stamp.tzinfo is not None:
+        stamp = stamp.astimezone()
+    return stamp.date()
+
+
+def rebuild():
+    """Recomputes every daily bucket from the cloud 'workouts' and 'nutrition_logs' tables."""
+    buckets = {}
+    workouts = meals = 0
+    for page in iter_pages("workouts", "id, created_at"):
+        for row in page:
+            b = buckets.setdefault(_day_of(row['created_at']), [0, 0.0])
+            b[0] += 1
+            workouts += 1
+    for page in iter_pages("nutrition_logs", "id, created_at, protein_g"):
+        for row in page:
+            b = buckets.setdefault(_day_of(row['created_at']), [0, 0.0])
+            b[1] += float(row['protein_g'] or 0)
+            meals += 1
+
+    initialize_series()
+    conn = _connect()
+    try:
+        with conn:
+            conn.execute("DELETE FROM fitness_days")
+            conn.executemany(
+                "INSERT INTO fitness_days (day, sessions, protein_g) VALUES (?, ?, ?)",
+                [(day.isoformat(), s, p) for day, (s, p) in buckets.items()]
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO fitness_meta (key, value) VALUES ('built_at', ?)",
+                (datetime.now().isoformat(timespec="seconds"),)
+            )
+    finally:
+        conn.close()
+
+    with _lock:
+        _reset()
+    return f"✅ Rebuilt {len(buckets)} days from {workouts} workouts and {meals} protein logs."
+
+
+def is_built():
+    """True once rebuild() has run, i.e. buckets cover the full history."""
+    if not os.path.exists(FITNESS_FILE):
+        return False
+    initialize_series()
+    conn = _connect()
+    try:
+        return conn.execute("SELECT 1 FROM fitness_meta WHERE key = 'built_at'").fetchone() is not None
+    finally:
+        conn.close()
+
+
+# --- QUERIES ---
+
+def get_window(days):
+    """
+    Totals for the last 'days' days (today included):
+    {"days", "gym_days", "sessions", "protein_g", "avg_protein_g", "gym_rate"}
+    """
+    days = max(1, int(days))
+    with _lock:
+        _load()
+        _extend_through(date.today())
+        n = len(_sessions)
+        first = max(0, n - days)
+        gym_days = _prefix_gym_days[n] - _prefix_gym_days[first]
+        sessions = _prefix_sessions[n] - _prefix_sessions[first]
+        protein = _prefix_protein[n] - _prefix_protein[first]
+    return {
+        "days": days,
+        "gym_days": gym_days,
+        "sessions": sessions,
+        "protein_g": round(protein, 1),
+        "avg_protein_g": round(protein / days, 1),   # moving average over the window
+        "gym_rate": round(gym_days / days, 3),
+    }
+
+
+def get_streaks():
+    """
+    {"current": gym days in a row up to today (or yesterday, if today isn't over yet),
+     "longest": longest run ever}
+    """
+    with _lock:
+        _load()
+        _extend_through(date.today())
+        current = _runs[-1] or (_runs[-2] if len(_runs) > 1 else 0)
+        return {"current": current, "longest": _longest}
+
+
+def get_daily(days):
+    """Per-day buckets for the last 'days' days, oldest first."""
+    days = max(1, int(days))
+    today = date.today()
+    with _lock:
+        _load()
+        _extend_through(today)
+        n = len(_sessions)
+        out = []
+        for offset in range(days - 1, -1, -1):
+            i = n - 1 - offset
+            out.append({
+                "date": (today - timedelta(days=offset)).isoformat(),
+                "sessions": _sessions[i] if i >= 0 else 0,
+                "protein_g": round(_protein[i], 1) if i >= 0 else 0.0,
+            })
+    return out
+
+
+def summary(windows=WINDOWS):
+    """{"windows": {N: get_window(N)}, "streaks": get_streaks()}"""
+    return {"windows": {n: get_window(n) for n in windows}, "streaks": get_streaks()}
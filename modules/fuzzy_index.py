@@ -0,0 +1,89 @@
+import threading
+from collections import Counter
+
+
+def trigrams(text):
+    """pg_trgm-style trigrams: each word padded with two spaces in front and one behind."""
+    grams = set()
+    for word in str(text).lower().split():
+        padded = f"  {word} "
+        for i in range(len(padded) - 2):
+            grams.add(padded[i:i + 3])
+    return grams
+
+
+class TrigramIndex:
+    """
+    In-memory fuzzy lookup ("Prathm" -> "pratham", "burgers" -> "burger").
+    An inverted index from trigram to keys means a search only touches keys that
+    share at least one trigram with the query, so it stays fast at tens of
+    thousands of entries.
+    """
+
+    def __init__(self):
+        self._postings = {}     # trigram -> set of keys
+        self._key_grams = {}    # key -> set of trigrams
+        self._values = {}       # key -> value
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._values)
+
+    def add(self, key, value=None):
+        """Adds or replaces an entry."""
+        with self._lock:
+            self._remove(key)
+            grams = trigrams(key)
+            self._key_grams[key] = grams
+            self._values[key] = value
+            for g in grams:
+                self._postings.setdefault(g, set()).add(key)
+
+    def remove(self, key):
+        with self._lock:
+            self._remove(key)
+
+    def _remove(self, key):
+        for g in self._key_grams.pop(key, ()):
+            keys = self._postings.get(g)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._postings[g]
+        self._values.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._postings.clear()
+            self._key_grams.clear()
+            self._values.clear()
+
+    def search(self, query, limit=5, min_score=0.3):
+        """
+        Returns up to 'limit' (key, value, score) tuples, best first.
+        Score is trigram similarity (shared / total distinct trigrams), 1.0 = identical.
+        """
+        query_grams = trigrams(query)
+        if not query_grams:
+            return []
+
+        with self._lock:
+            shared = Counter()
+            for g in query_grams:
+                postings = self._postings.get(g)
+                if postings:
+                    shared.update(postings)
+
+            # A key needs at least this many shared trigrams to reach min_score
+            n = len(query_grams)
+            floor = min_score * n
+            results = []
+            for key, common in shared.items():
+                if common < floor:
+                    continue
+                score = common / (n + len(self._key_grams[key]) - common)
+                if score >= min_score:
+                    results.append((key, self._values[key], round(score, 3)))
+
+        results.sort(key=lambda r: (-r[2], r[0]))
+        return results[:limit]
@@ -0,0 +1,222 @@
+import contextvars
+import cProfile
+import functools
+import os
+import threading
+import time
+from collections import deque
+from modules import singleflight
+
+# Set PYLIFE_PROFILE_DIR to dump one cProfile file per tool call into that folder
+PROFILE_DIR = os.getenv("PYLIFE_PROFILE_DIR")
+SAMPLE_SIZE = 1000  # latencies kept per tool / request type for percentiles
+
+# RPCs that only read, so identical concurrent calls can share one request
+READ_ONLY_RPCS = {"query_social_ledger", "get_expense_stats", "get_fitness_stats",
+                  "get_daily_spend", "get_category_spend"}
+
+_lock = threading.Lock()
+_tool_stats = {}       # tool name -> {"latencies", "calls", "errors", "round_trips"}
+_request_stats = {}    # "table.action" / "rpc.name" -> {"latencies", "calls", "errors"}
+
+# Round-trip counter of the tool call running in this thread / task
+_current_call = contextvars.ContextVar("pylife_current_call", default=None)
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def _summarize(latencies):
+    values = sorted(latencies)
+    return {
+        "p50_ms": round(_percentile(values, 50) * 1000, 2),
+        "p95_ms": round(_percentile(values, 95) * 1000, 2),
+        "p99_ms": round(_percentile(values, 99) * 1000, 2),
+    }
+
+
+def _looks_like_error(result):
+    """Tools report failures as strings ("❌ ...", "Error: ...", "Database Error: ...")."""
+    return isinstance(result, str) and (result.startswith("❌") or "Error" in result.split(":")[0])
+
+
+# --- TOOL CALLS ---
+
+def instrument_tool(func):
+    """Records latency, round trips and errors for every call of a tool function."""
+    name = func.__name__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        call = {"round_trips": 0}
+        token = _current_call.set(call)
+        failed = False
+        start = time.perf_counter()
+        try:
+            if PROFILE_DIR:
+                profiler = cProfile.Profile()
+                try:
+                    result = profiler.runcall(func, *args, **kwargs)
+                finally:
+                    os.makedirs(PROFILE_DIR, exist_ok=True)
+                    profiler.dump_stats(os.path.join(PROFILE_DIR, f"{name}-{time.time_ns()}.prof"))
+            else:
+                result = func(*args, **kwargs)
+            failed = _looks_like_error(result)
+            return result
+        except Exception:
+            failed = True
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            _current_call.reset(token)
+            with _lock:
+                stats = _tool_stats.setdefault(
+                    name, {"latencies": deque(maxlen=SAMPLE_SIZE), "calls": 0, "errors": 0, "round_trips": 0})
+                stats["latencies"].append(elapsed)
+                stats["calls"] += 1
+                stats["errors"] += int(failed)
+                stats["round_trips"] += call["round_trips"]
+
+    return wrapper
+
+
+# --- CLIENT REQUESTS ---
+
+def _record_request(label, elapsed, failed):
+    call = _current_call.get()
+    if call is not None:
+        call["round_trips"] += 1
+    with _lock:
+        stats = _request_stats.setdefault(label, {"latencies": deque(maxlen=SAMPLE_SIZE), "calls": 0, "errors": 0})
+        stats["latencies"].append(elapsed)
+        stats["calls"] += 1
+        stats["errors"] += int(failed)
+
+
+class _InstrumentedQuery:
+    """
+    Wraps a postgrest query builder; every execute() is timed and counted.
+    The chain of builder calls is remembered so identical concurrent reads
+    can be coalesced into one request (see modules/singleflight.py).
+    """
+
+    ACTIONS = ("select", "insert", "upsert", "update", "delete")
+
+    def __init__(self, builder, table, action=None, chain=()):
+        self._builder = builder
+        self._table = table
+        self._action = action
+        self._chain = chain
+
+    def __getattr__(self, attr):
+        target = getattr(self._builder, attr)
+        if not callable(target):
+            # e.g. the '.not_' property returns a builder too
+            if hasattr(target, "execute"):
+                return _InstrumentedQuery(target, self._table, self._action, self._chain + ((attr,),))
+            return target
+
+        def call(*args, **kwargs):
+            result = target(*args, **kwargs)
+            action = self._action or (attr if attr in self.ACTIONS else None)
+            # Builders return new builder objects; keep wrapping them
+            if hasattr(result, "execute"):
+                return _InstrumentedQuery(result, self._table, action,
+                                          self._chain + ((attr, args, sorted(kwargs.items())),))
+            return result
+        return call
+
+    def _send(self):
+        label = f"{self._table}.{self._action or 'select'}"
+        start = time.perf_counter()
+        failed = True
+        try:
+            response = self._builder.execute()
+            failed = False
+            return response
+        finally:
+            _record_request(label, time.perf_counter() - start, failed)
+
+    def _is_read(self):
+        if self._table == "rpc":
+            return self._action in READ_ONLY_RPCS
+        return self._action in (None, "select")
+
+    def execute(self):
+        if not self._is_read():
+            return self._send()
+        key = repr((self._table, self._action, self._chain))
+        return singleflight.do(key, self._send)
+
+
+class InstrumentedClient:
+    """Wraps the Supabase client returned by get_client()."""
+
+    def __init__(self, client):
+        self._client = client
+
+    def table(self, name):
+        return _InstrumentedQuery(self._client.table(name), name)
+
+    def rpc(self, name, params=None):
+        return _InstrumentedQuery(self._client.rpc(name, params), "rpc", name,
+                                  (("rpc", name, sorted((params or {}).items())),))
+
+    def __getattr__(self, attr):
+        return getattr(self._client, attr)
+
+
+# --- REPORTING ---
+
+def get_stats():
+    """Per-tool and per-request percentiles, counts, error rates and round trips per call."""
+    with _lock:
+        tools = {}
+        for name, s in _tool_stats.items():
+            tools[name] = {
+                "calls": s["calls"],
+                "error_rate": round(s["errors"] / s["calls"], 3) if s["calls"] else 0.0,
+                "round_trips_per_call": round(s["round_trips"] / s["calls"], 2) if s["calls"] else 0.0,
+                **_summarize(s["latencies"]),
+            }
+        requests = {}
+        for label, s in _request_stats.items():
+            requests[label] = {
+                "calls": s["calls"],
+                "error_rate": round(s["errors"] / s["calls"], 3) if s["calls"] else 0.0,
+                **_summarize(s["latencies"]),
+            }
+    return {"tools": tools, "requests": requests, "coalescing": singleflight.get_stats()}
+
+
+def format_stats():
+    """Human-readable version of get_stats() for the server_stats tool."""
+    stats = get_stats()
+    if not stats["tools"] and not stats["requests"]:
+        return "No calls recorded yet."
+
+    lines = ["--- Tool Latency ---"]
+    for name, s in sorted(stats["tools"].items(), key=lambda kv: -kv[1]["p95_ms"]):
+        lines.append(f"{name}: {s['calls']} calls | p50 {s['p50_ms']}ms | p95 {s['p95_ms']}ms | "
+                     f"p99 {s['p99_ms']}ms | {s['round_trips_per_call']} trips/call | "
+                     f"{s['error_rate'] * 100:.1f}% errors")
+
+    lines.append("--- Database Requests ---")
+    for label, s in sorted(stats["requests"].items(), key=lambda kv: -kv[1]["p95_ms"]):
+        lines.append(f"{label}: {s['calls']} calls | p50 {s['p50_ms']}ms | p95 {s['p95_ms']}ms | "
+                     f"p99 {s['p99_ms']}ms | {s['error_rate'] * 100:.1f}% errors")
+
+    c = stats["coalescing"]
+    lines.append(f"--- Coalescing ---\n{c['coalesced']} duplicate reads shared {c['leaders']} requests")
+    return "\n".join(lines)
+
+
+def reset_stats():
+    with _lock:
+        _tool_stats.clear()
+        _request_stats.clear()
@@ -0,0 +1,130 @@
+import heapq
+import threading
+import time
+from modules.database import iter_pages
+
+# --- IN-MEMORY LEDGER ---
+# Outstanding amounts per (borrower_id, lender_id), built once from debts + payments
+# and kept current by log_debt / record_payment. Reloaded after LEDGER_TTL seconds
+# to pick up writes made by other processes.
+LEDGER_TTL = 300
+EPSILON = 0.005  # below half a paisa counts as settled
+
+_owed = {}              # (borrower_id, lender_id) -> outstanding amount
+_debt_balances = {}     # debt_id -> [borrower_id, lender_id, outstanding]
+_loaded_at = 0.0
+_lock = threading.Lock()
+
+
+def _load():
+    """Downloads Active debts and their payments and rebuilds the pair balances."""
+    global _owed, _debt_balances, _loaded_at
+
+    debts = {}
+    for page in iter_pages("debts", "id, borrower_id, lender_id, amount",
+                           query=lambda q: q.eq("status", "Active")):
+        for d in page:
+            debts[d['id']] = [d['borrower_id'], d['lender_id'], float(d['amount'])]
+
+    for page in iter_pages("payments", "id, debt_id, amount"):
+        for p in page:
+            debt = debts.get(p['debt_id'])
+            if debt is not None:
+                debt[2] -= float(p['amount'])
+
+    owed = {}
+    for borrower_id, lender_id, outstanding in debts.values():
+        if outstanding > EPSILON:
+            key = (borrower_id, lender_id)
+            owed[key] = owed.get(key, 0.0) + outstanding
+
+    _owed, _debt_balances = owed, debts
+    _loaded_at = time.monotonic()
+
+
+def _ensure_loaded():
+    if not _loaded_at or time.monotonic() - _loaded_at > LEDGER_TTL:
+        _load()
+
+
+def invalidate():
+    """Forces a reload on the next query."""
+    global _loaded_at
+    with _lock:
+        _loaded_at = 0.0
+
+
+def apply_debt(debt_id, borrower_id, lender_id, amount):
+    """Records a new debt (called right after it is written)."""
+    with _lock:
+        if not _loaded_at:
+            return  # the first query will load it from the database
+        amount = float(amount)
+        key = (borrower_id, lender_id)
+        _owed[key] = _owed.get(key, 0.0) + amount
+        if debt_id is not None:
+            _debt_balances[debt_id] = [borrower_id, lender_id, amount]
+
+
+def apply_payment(payer_id, receiver_id, allocations):
+    """Records a payback; allocations is [(debt_id, amount), ...] as written by record_payment."""
+    with _lock:
+        if not _loaded_at:
+            return
+        key = (payer_id, receiver_id)
+        for debt_id, amount in allocations:
+            _owed[key] = _owed.get(key, 0.0) - float(amount)
+            debt = _debt_balances.get(debt_id)
+            if debt is not None:
+                debt[2] -= float(amount)
+        if _owed.get(key, 0.0) <= EPSILON:
+            _owed.pop(key, None)
+
+
+def net_balances(person_id):
+    """
+    Net position of everyone against one person: {other_id: amount}.
+    Positive = other owes person, negative = person owes other.
+    """
+    with _lock:
+        _ensure_loaded()
+        net = {}
+        for (borrower_id, lender_id), amount in _owed.items():
+            if lender_id == person_id:
+                net[borrower_id] = net.get(borrower_id, 0.0) + amount
+            elif borrower_id == person_id:
+                net[lender_id] = net.get(lender_id, 0.0) - amount
+    return {other: round(amt, 2) for other, amt in net.items() if abs(amt) > EPSILON}
+
+
+def simplify():
+    """
+    Minimum cash flow settle-up plan for everyone in the ledger.
+    Returns [(payer_id, receiver_id, amount), ...] - at most (people - 1) transfers.
+    """
+    with _lock:
+        _ensure_loaded()
+        position = {}
+        for (borrower_id, lender_id), amount in _owed.items():
+            position[borrower_id] = position.get(borrower_id, 0.0) - amount
+            position[lender_id] = position.get(lender_id, 0.0) + amount
+
+    # Max-heaps (negated) of what each creditor is owed and each debtor owes
+    creditors = [(-amt, pid) for pid, amt in position.items() if amt > EPSILON]
+    debtors = [(amt, pid) for pid, amt in position.items() if amt < -EPSILON]
+    heapq.heapify(creditors)
+    heapq.heapify(debtors)
+
+    plan = []
+    while creditors and debtors:
+        credit, creditor = heapq.heappop(creditors)
+        debit, debtor = heapq.heappop(debtors)
+        transfer = min(-credit, -debit)
+        plan.append((debtor, creditor, round(transfer, 2)))
+
+        # Push back whoever still has a balance left
+        if -credit - transfer > EPSILON:
+            heapq.heappush(creditors, (credit + transfer, creditor))
+        if -debit - transfer > EPSILON:
+            heapq.heappush(debtors, (debit + transfer, debtor))
+    return plan
@@ -1,7 +1,10 @@
+import csv
+import json
 import os
-import pandas as pd
+import threading
 from datetime import date
-from modules.database import get_client
+from modules.database import get_client, is_missing_column, iter_pages
+from modules import rollups, snapshot
 
 # --- CONFIGURATION ---
 CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -9,60 +12,245 @@ PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
 REPORTS_FOLDER = os.path.join(PROJECT_ROOT, 'reports')
 EXCEL_FILE = os.path.join(REPORTS_FOLDER, 'data.xlsx')
 
+EXPORT_FORMATS = ("xlsx", "csv", "jsonl", "parquet")
+# (table, sheet / file name)
+EXPORT_TABLES = [("expenses", "Expenses"), ("debts", "Debts")]
+# Parquet column types, declared up front so every page is written with the same schema
+EXPORT_COLUMNS = {
+    "expenses": snapshot.TABLE_COLUMNS["expenses"],
+    "debts": snapshot.TABLE_COLUMNS["debts"] + [("borrower_name", "string")],
+}
+
+# Tables whose changes make the export stale (payments flip debt status)
+FINGERPRINT_TABLES = ["expenses", "debts", "friends", "payments"]
+FINGERPRINT_FILE = os.path.join(REPORTS_FOLDER, '.export_fingerprint.json')
+
+
+def _iter_export_pages(table, friend_names):
+    """Streams a table page by page; debts get a readable borrower_name column."""
+    for page in iter_pages(table):
+        if table == "debts":
+            for row in page:
+                row['borrower_name'] = friend_names.get(row.get('borrower_id'))
+        yield page
+
+
+def _write_xlsx(pages_by_sheet, path):
+    """Write-only workbook: rows are flushed to disk as they arrive."""
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    for sheet_name, pages in pages_by_sheet:
+        ws = wb.create_sheet(sheet_name)
+        columns = None
+        for page in pages:
+            for row in page:
+                if columns is None:
+                    columns = list(row.keys())
+                    ws.append(columns)
+                ws.append([row.get(c) for c in columns])
+        if columns is None:
+            # Create a placeholder sheet if there is no data
+            ws.append(['Message'])
+            ws.append([f'No {sheet_name.lower()} found'])
+    wb.save(path)
+
+
+def _write_csv(pages, path):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = None
+        for page in pages:
+            for row in page:
+                if writer is None:
+                    writer = csv.DictWriter(f, fieldnames=list(row.keys()), extrasaction='ignore')
+                    writer.writeheader()
+                writer.writerow(row)
+
+
+def _write_jsonl(pages, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        for page in pages:
+            for row in page:
+                f.write(json.dumps(row, default=str) + "\n")
+
+
+def _write_parquet(pages, path, columns):
+    """
+    One row group per page, so memory stays at one page. Declared 'columns' keep
+    their types (inferring from the first page turns a whole-number float into
+    int64 and an all-null column into null); any other column on the first page
+    (created_at, updated_at, ...) is written as a string, like in the CSV export.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow).")
+
+    declared = dict(columns)
+    extra = []
+    writer = None
+    try:
+        for page in pages:
+            if writer is None:
+                extra = [key for key in page[0] if key not in declared]
+                schema = pa.schema([(name, getattr(pa, kind)()) for name, kind in columns]
+                                   + [(key, pa.string()) for key in extra])
+                writer = pq.ParquetWriter(path, schema)
+            if extra:
+                page = [dict(row, **{k: None if row.get(k) is None else str(row[k]) for k in extra})
+                        for row in page]
+            writer.write_table(pa.Table.from_pylist(page, schema=writer.schema))
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def export_data(fmt="xlsx"):
+    """
+    Streams every table from Supabase into reports/ without loading it all in memory.
+    xlsx -> reports/data.xlsx (one sheet per table)
+    csv / jsonl / parquet -> reports/<table>.<fmt>
+    """
+    fmt = fmt.lower()
+    if fmt not in EXPORT_FORMATS:
+        return f"❌ Unknown format '{fmt}'. Use one of: {', '.join(EXPORT_FORMATS)}"
 
-def export_to_excel():
-    """Fetches all data from Supabase and saves it to reports/data.xlsx"""
     if not os.path.exists(REPORTS_FOLDER):
         os.makedirs(REPORTS_FOLDER)
 
-    supabase = get_client()
     try:
-        # 1. Fetch Expenses (Cloud)
-        exp_res = supabase.table("expenses").select("*").execute()
-        df_expenses = pd.DataFrame(exp_res.data)
-
-        # 2. Fetch Debts (Cloud)
-        debt_res = supabase.table("debts").select("*").execute()
-
-        # 3. Fetch Friends (Cloud) to resolve IDs -> Names
-        friend_res = supabase.table("friends").select("id, name").execute()
-
-        df_debts = pd.DataFrame(debt_res.data)
-        df_friends = pd.DataFrame(friend_res.data)
-
-        # Merge if data exists to replace IDs with Names
-        if not df_debts.empty and not df_friends.empty:
-            df_debts = df_debts.merge(df_friends, left_on='borrower_id', right_on='id', how='left')
-            # Rename column for clarity
-            df_debts.rename(columns={'name': 'borrower_name'}, inplace=True)
-            # Cleanup: Drop extra ID columns if preferred (optional)
-            if 'id_y' in df_debts.columns:
-                df_debts.drop(columns=['id_y'], inplace=True)
-
-        # 4. Write to Excel
-        with pd.ExcelWriter(EXCEL_FILE, engine='openpyxl') as writer:
-            if not df_expenses.empty:
-                df_expenses.to_excel(writer, sheet_name='Expenses', index=False)
-            else:
-                # Create empty sheet if no data to avoid errors
-                pd.DataFrame({'Message': ['No expenses found']}).to_excel(writer, sheet_name='Expenses', index=False)
+        # Friends are small - load once to resolve IDs -> Names
+        friend_names = {f['id']: f['name'] for page in iter_pages("friends", "id, name") for f in page}
 
-            if not df_debts.empty:
-                df_debts.to_excel(writer, sheet_name='Debts', index=False)
+        # Write to a temp file first so a failed export never leaves a half-written report
+        if fmt == "xlsx":
+            tmp_path = EXCEL_FILE + ".tmp"
+            pages_by_sheet = [(sheet, _iter_export_pages(table, friend_names)) for table, sheet in EXPORT_TABLES]
+            _write_xlsx(pages_by_sheet, tmp_path)
+            os.replace(tmp_path, EXCEL_FILE)
+            return f"📊 Excel file saved at: {EXCEL_FILE}"
+
+        writers = {"csv": _write_csv, "jsonl": _write_jsonl}
+        saved = []
+        for table, _ in EXPORT_TABLES:
+            path = os.path.join(REPORTS_FOLDER, f"{table}.{fmt}")
+            pages = _iter_export_pages(table, friend_names)
+            if fmt == "parquet":
+                _write_parquet(pages, path + ".tmp", EXPORT_COLUMNS[table])
             else:
-                pd.DataFrame({'Message': ['No debts found']}).to_excel(writer, sheet_name='Debts', index=False)
+                writers[fmt](pages, path + ".tmp")
+            if os.path.exists(path + ".tmp"):
+                os.replace(path + ".tmp", path)
+                saved.append(path)
+        return f"📊 Export saved: {', '.join(saved) if saved else 'no data found'}"
+    except Exception as e:
+        return f"❌ Error generating {fmt} export: {str(e)}"
+
+
+def export_to_excel():
+    """Fetches all data from Supabase and saves it to reports/data.xlsx"""
+    return export_data("xlsx")
+
+
+# --- CHANGE DETECTION ---
+_tables_without_updated_at = set()
+
+
+def _table_fingerprint(supabase, table):
+    """Row count, max id and (if the column exists) latest updated_at - two tiny requests."""
+    res = supabase.table(table).select("id", count="exact").order("id", desc=True).limit(1).execute()
+    fingerprint = {"count": res.count, "max_id": res.data[0]['id'] if res.data else None}
+
+    if table not in _tables_without_updated_at:
+        try:
+            upd = supabase.table(table).select("updated_at").order("updated_at", desc=True).limit(1).execute()
+            fingerprint["updated_at"] = upd.data[0]['updated_at'] if upd.data else None
+        except Exception as e:
+            if not is_missing_column(e):
+                raise
+            # Column doesn't exist - don't ask again
+            _tables_without_updated_at.add(table)
+    return fingerprint
+
+
+def export_fingerprint():
+    """Content fingerprint of every table the export depends on."""
+    supabase = get_client()
+    return {table: _table_fingerprint(supabase, table) for table in FINGERPRINT_TABLES}
 
-        return f"📊 Excel file saved at: {EXCEL_FILE}"
+
+def _load_saved_fingerprint():
+    try:
+        with open(FINGERPRINT_FILE, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def export_if_changed():
+    """Rebuilds reports/data.xlsx only when the cloud data changed since the last export."""
+    try:
+        fingerprint = export_fingerprint()
     except Exception as e:
-        return f"❌ Error generating Excel: {str(e)}"
+        return f"❌ Error checking for changes: {str(e)}"
+
+    if os.path.exists(EXCEL_FILE) and _load_saved_fingerprint() == fingerprint:
+        return f"📊 Excel file is up to date: {EXCEL_FILE}"
+
+    status = export_to_excel()
+    if not status.startswith("❌"):
+        with open(FINGERPRINT_FILE, 'w', encoding='utf-8') as f:
+            json.dump(fingerprint, f)
+    return status
+
+
+# --- BACKGROUND EXPORT WORKER ---
+# One export at a time; requests that arrive while it runs trigger exactly one more pass.
+_export_lock = threading.Lock()
+_export_thread = None
+_export_rerun = False
+_last_export_status = None
+
+
+def _export_worker():
+    global _export_thread, _export_rerun, _last_export_status
+    while True:
+        _last_export_status = export_if_changed()
+        with _export_lock:
+            if not _export_rerun:
+                _export_thread = None
+                return
+            _export_rerun = False
+
+
+def schedule_export():
+    """Starts (or queues) a background Excel export and returns immediately."""
+    global _export_thread, _export_rerun
+    with _export_lock:
+        if _export_thread is not None:
+            _export_rerun = True
+            return "📊 Excel export already running - it will pick up the latest data."
+        _export_thread = threading.Thread(target=_export_worker, name="excel-export")
+        _export_thread.start()
+    return f"📊 Excel file is being updated in the background: {EXCEL_FILE}"
+
+
+def wait_for_export(timeout=None):
+    """Blocks until the background export finishes and returns its status."""
+    thread = _export_thread
+    if thread is not None:
+        thread.join(timeout)
+    return _last_export_status
 
 
 def generate_monthly_report(month=None, year=None):
     """
-    Generates the Excel file locally and returns a text summary for the Agent.
+    Returns a text summary for the Agent right away.
+    The Excel file is refreshed in the background (and skipped if nothing changed).
     """
-    # 1. Create the Excel File
-    excel_status = export_to_excel()
+    # 1. Refresh the Excel File (background worker)
+    excel_status = schedule_export()
 
     # 2. Build the Text Report
     if month is None or year is None:
@@ -85,24 +273,38 @@ def generate_monthly_report(month=None, year=None):
     output.append(excel_status)
 
     try:
-        supabase = get_client()
+        if rollups.is_built():
+            # Fast path: read the month's buckets instead of every expense row
+            month_key = f"{year}-{month:02d}"
+            totals = rollups.get_month_totals(month_key).get(month_key)
+            if not totals:
+                output.append("No expenses recorded for this month.")
+                return "\n".join(output)
+            total_spent, healthy_spent, unhealthy_spent = totals["total"], totals["healthy"], totals["unhealthy"]
+        else:
+            supabase = get_client()
 
-        # Filter: date >= start_date AND date < end_date
-        response = supabase.table("expenses").select("*") \
-            .gte("date", start_date) \
-            .lt("date", end_date) \
-            .execute()
+            # Filter: date >= start_date AND date < end_date
+            response = supabase.table("expenses").select("amount, is_healthy") \
+                .gte("date", start_date) \
+                .lt("date", end_date) \
+                .execute()
 
-        rows = response.data
+            rows = response.data
 
-        if not rows:
-            output.append("No expenses recorded for this month.")
-            return "\n".join(output)
+            if not rows:
+                output.append("No expenses recorded for this month.")
+                return "\n".join(output)
 
-        # Calculate Stats in Python
-        total_spent = sum(float(r['amount']) for r in rows)
-        healthy_spent = sum(float(r['amount']) for r in rows if r['is_healthy'] is True)
-        unhealthy_spent = sum(float(r['amount']) for r in rows if r['is_healthy'] is False)
+            # Calculate Stats in one pass
+            total_spent = healthy_spent = unhealthy_spent = 0.0
+            for r in rows:
+                amount = float(r['amount'])
+                total_spent += amount
+                if r['is_healthy'] is True:
+                    healthy_spent += amount
+                elif r['is_healthy'] is False:
+                    unhealthy_spent += amount
 
         output.append(f"💰 Total Spent:   ₹{total_spent:,.2f}")
         output.append(f"🥗 Healthy:       ₹{healthy_spent:,.2f}")
@@ -115,4 +317,75 @@ def generate_monthly_report(month=None, year=None):
     except Exception as e:
         output.append(f"Cloud Error: {str(e)}")
 
-    return "\n".join(output)
\ No newline at end of file
+    return "\n".join(output)
+
+
+def _next_month_start(month_key):
+    """'2024-12' -> '2025-01-01'"""
+    year, month = (int(p) for p in month_key.split("-"))
+    return f"{year + 1}-01-01" if month == 12 else f"{year}-{month + 1:02d}-01"
+
+
+def generate_range_report(start_month, end_month):
+    """
+    Summarizes every month from start_month to end_month ('YYYY-MM') in one pass.
+    Uses the rollups when built, then the local DuckDB snapshot if one was taken
+    ('python main.py snapshot'), otherwise ONE paged fetch grouped with pandas.
+    """
+    import pandas as pd
+
+    output = [f"--- 📅 Report for {start_month} to {end_month} ---"]
+
+    try:
+        if rollups.is_built():
+            totals = rollups.get_month_totals(start_month, end_month)
+            df = pd.DataFrame.from_dict(totals, orient='index')
+        elif snapshot.is_available():
+            columns, rows = snapshot.query('''
+                SELECT strftime(date, '%Y-%m') AS month,
+                       SUM(amount) AS total,
+                       SUM(CASE WHEN is_healthy THEN amount ELSE 0 END) AS healthy,
+                       SUM(CASE WHEN is_healthy = false THEN amount ELSE 0 END) AS unhealthy,
+                       COUNT(*) AS count
+                FROM expenses
+                WHERE date >= CAST(? AS DATE) AND date < CAST(? AS DATE)
+                GROUP BY month
+            ''', [f"{start_month}-01", _next_month_start(end_month)])
+            df = pd.DataFrame(rows, columns=columns).set_index('month')
+        else:
+            rows = []
+            for page in iter_pages("expenses", "date, amount, is_healthy",
+                                   query=lambda q: q.gte("date", f"{start_month}-01")
+                                                    .lt("date", _next_month_start(end_month))):
+                rows.extend(page)
+
+            raw = pd.DataFrame(rows)
+            if raw.empty:
+                df = raw
+            else:
+                raw['month'] = raw['date'].astype(str).str[:7]
+                raw['amount'] = raw['amount'].astype(float)
+                raw['healthy'] = raw['amount'].where(raw['is_healthy'] == True, 0.0)
+                raw['unhealthy'] = raw['amount'].where(raw['is_healthy'] == False, 0.0)
+                df = raw.groupby('month').agg(total=('amount', 'sum'), healthy=('healthy', 'sum'),
+                                              unhealthy=('unhealthy', 'sum'), count=('amount', 'size'))
+
+        if df.empty:
+            output.append("No expenses recorded in this range.")
+            return "\n".join(output)
+
+        df = df.sort_index()
+        df['score'] = (df['healthy'] / df['total'].where(df['total'] > 0) * 100).fillna(0)
+
+        for month_key, r in df.iterrows():
+            output.append(f"{month_key}: ₹{r['total']:,.2f} | 🥗 ₹{r['healthy']:,.2f} | 🍔 ₹{r['unhealthy']:,.2f} | {r['score']:.1f}% Healthy")
+
+        total_spent = df['total'].sum()
+        output.append(f"💰 Total Spent:   ₹{total_spent:,.2f}")
+        if total_spent > 0:
+            output.append(f"📈 Diet Score:    {df['healthy'].sum() / total_spent * 100:.1f}% Healthy Spending")
+
+    except Exception as e:
+        output.append(f"Cloud Error: {str(e)}")
+
+    return "\n".join(output)
@@ -0,0 +1,166 @@
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from modules.database import iter_pages
+
+# --- CONFIGURATION ---
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
+ROLLUP_FILE = os.path.join(PROJECT_ROOT, 'data', 'rollups.db')
+
+_initialized = False
+_init_lock = threading.Lock()
+
+
+def _connect():
+    conn = sqlite3.connect(ROLLUP_FILE, timeout=10)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    return conn
+
+
+def initialize_rollups():
+    """Creates the rollup tables if they do not exist."""
+    global _initialized
+    with _init_lock:
+        if _initialized:
+            return
+        os.makedirs(os.path.dirname(ROLLUP_FILE), exist_ok=True)
+        conn = _connect()
+        try:
+            # One bucket per (month, category, health status)
+            conn.execute('''
+            CREATE TABLE IF NOT EXISTS spending_rollups (
+                month TEXT NOT NULL,
+                category TEXT NOT NULL,
+                health TEXT NOT NULL,
+                total REAL NOT NULL,
+                count INTEGER NOT NULL,
+                min_amount REAL NOT NULL,
+                max_amount REAL NOT NULL,
+                PRIMARY KEY (month, category, health)
+            )
+            ''')
+            conn.execute('''
+            CREATE TABLE IF NOT EXISTS rollup_meta (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            )
+            ''')
+            conn.commit()
+            _initialized = True
+        finally:
+            conn.close()
+
+
+def health_label(is_healthy):
+    if is_healthy is True:
+        return "Healthy"
+    if is_healthy is False:
+        return "Unhealthy"
+    return "Unknown"
+
+
+def _bucket_key(row):
+    return (str(row['date'])[:7], row.get('category') or "General", health_label(row.get('is_healthy')))
+
+
+def record_expenses(rows):
+    """Adds freshly logged expenses to their buckets (called on every write)."""
+    initialize_rollups()
+    conn = _connect()
+    try:
+        for row in rows:
+            amount = float(row['amount'])
+            conn.execute('''
+                INSERT INTO spending_rollups (month, category, health, total, count, min_amount, max_amount)
+                VALUES (?, ?, ?, ?, 1, ?, ?)
+                ON CONFLICT (month, category, health) DO UPDATE SET
+                    total = total + excluded.total,
+                    count = count + 1,
+                    min_amount = MIN(min_amount, excluded.min_amount),
+                    max_amount = MAX(max_amount, excluded.max_amount)
+            ''', (*_bucket_key(row), amount, amount, amount))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def rebuild():
+    """Recomputes every bucket from the cloud 'expenses' table (use after drift)."""
+    buckets = {}
+    rows_seen = 0
+    for page in iter_pages("expenses", "date, amount, category, is_healthy"):
+        for row in page:
+            amount = float(row['amount'])
+            key = _bucket_key(row)
+            b = buckets.get(key)
+            if b is None:
+                buckets[key] = [amount, 1, amount, amount]
+            else:
+                b[0] += amount
+                b[1] += 1
+                b[2] = min(b[2], amount)
+                b[3] = max(b[3], amount)
+            rows_seen += 1
+
+    initialize_rollups()
+    conn = _connect()
+    try:
+        with conn:
+            conn.execute("DELETE FROM spending_rollups")
+            conn.executemany(
+                "INSERT INTO spending_rollups VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(*key, *values) for key, values in buckets.items()]
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO rollup_meta (key, value) VALUES ('built_at', ?)",
+                (datetime.now().isoformat(timespec="seconds"),)
+            )
+    finally:
+        conn.close()
+    return f"✅ Rebuilt {len(buckets)} buckets from {rows_seen} expenses."
+
+
+def is_built():
+    """True once rebuild() has run, i.e. buckets cover the full history."""
+    if not os.path.exists(ROLLUP_FILE):
+        return False
+    initialize_rollups()
+    conn = _connect()
+    try:
+        return conn.execute("SELECT 1 FROM rollup_meta WHERE key = 'built_at'").fetchone() is not None
+    finally:
+        conn.close()
+
+
+def get_buckets(start_month, end_month=None):
+    """Returns bucket dicts for months in [start_month, end_month] ('YYYY-MM')."""
+    initialize_rollups()
+    conn = _connect()
+    try:
+        rows = conn.execute(
+            "SELECT * FROM spending_rollups WHERE month BETWEEN ? AND ? ORDER BY month, category, health",
+            (start_month, end_month or start_month)
+        ).fetchall()
+        return [dict(r) for r in rows]
+    finally:
+        conn.close()
+
+
+def get_month_totals(start_month, end_month=None):
+    """
+    Summarizes months from their buckets: {month: {"total", "healthy", "unhealthy", "count"}}.
+    Cost grows with the number of buckets, not the number of expenses.
+    """
+    totals = {}
+    for b in get_buckets(start_month, end_month):
+        t = totals.setdefault(b['month'], {"total": 0.0, "healthy": 0.0, "unhealthy": 0.0, "count": 0})
+        t["total"] += b['total']
+        t["count"] += b['count']
+        if b['health'] == "Healthy":
+            t["healthy"] += b['total']
+        elif b['health'] == "Unhealthy":
+            t["unhealthy"] += b['total']
+    return totals
@@ -0,0 +1,63 @@
+import copy
+import threading
+
+# --- SINGLE-FLIGHT ---
+# Concurrent identical reads share one in-flight request: the first caller (leader)
+# runs it, everyone else with the same key waits for that result instead of
+# hitting the database again. Nothing is cached once the request finishes.
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.followers = 0
+
+
+_lock = threading.Lock()
+_in_flight = {}
+_stats = {"leaders": 0, "coalesced": 0}
+
+
+def do(key, fn):
+    """Runs fn() once for all concurrent callers with the same key."""
+    with _lock:
+        call = _in_flight.get(key)
+        leader = call is None
+        if leader:
+            call = _Call()
+            _in_flight[key] = call
+            _stats["leaders"] += 1
+        else:
+            call.followers += 1
+            _stats["coalesced"] += 1
+
+    if not leader:
+        call.done.wait()
+        if call.error is not None:
+            raise call.error
+        # Callers may mutate rows (e.g. adding columns), so each follower gets its own copy
+        return copy.deepcopy(call.result)
+
+    result = None
+    try:
+        result = fn()
+        return result
+    except Exception as e:
+        call.error = e
+        raise
+    finally:
+        with _lock:
+            del _in_flight[key]
+            followers = call.followers
+        # Snapshot before the leader gets the result back and can modify it
+        if followers and call.error is None:
+            call.result = copy.deepcopy(result)
+        call.done.set()
+
+
+def get_stats():
+    """How many requests were actually sent (leaders) vs. served from another caller (coalesced)."""
+    with _lock:
+        return dict(_stats)
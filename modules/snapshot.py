@@ -0,0 +1,263 @@
+import json
+import os
+import re
+import threading
+import time
+from modules.database import get_client, is_missing_column, iter_pages
+
+# --- LOCAL ANALYTICS SNAPSHOT ---
+# Read-only copy of every table as Parquet files under data/snapshot/<table>/, kept up to
+# date incrementally, and queried with DuckDB. Analytics (ask_database(local=True), range
+# reports) run here instead of pulling full tables from the production database.
+# Needs the optional packages pyarrow and duckdb (pip install -e ".[analytics]").
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
+SNAPSHOT_FOLDER = os.path.join(PROJECT_ROOT, 'data', 'snapshot')
+
+MIN_SYNC_SECONDS = 30       # queries in quick succession share one sync
+RECONCILE_SECONDS = 3600    # full re-copy to pick up deletes (and edits on tables without updated_at)
+MAX_PARTS = 32              # more incremental parts than this -> compact with a full re-copy
+
+# Column types per table (Parquet files never disagree on a type)
+TABLE_COLUMNS = {
+    "friends": [("id", "int64"), ("name", "string"), ("phone", "string")],
+    "expenses": [("id", "int64"), ("date", "string"), ("item", "string"), ("amount", "float64"),
+                 ("category", "string"), ("is_healthy", "bool_")],
+    "item_health": [("id", "int64"), ("item", "string"), ("is_healthy", "bool_")],
+    "debts": [("id", "int64"), ("date", "string"), ("borrower_id", "int64"), ("lender_id", "int64"),
+              ("amount", "float64"), ("description", "string"), ("status", "string")],
+    "payments": [("id", "int64"), ("date", "string"), ("debt_id", "int64"), ("payer_id", "int64"),
+                 ("amount", "float64")],
+    "workouts": [("id", "int64"), ("created_at", "string"), ("workout_type", "string")],
+    "nutrition_logs": [("id", "int64"), ("created_at", "string"), ("item_name", "string"),
+                       ("protein_g", "float64")],
+}
+
+# Rows are only ever inserted here, so "id > last id" finds every change
+APPEND_ONLY = {"expenses", "payments", "workouts", "nutrition_logs"}
+
+_lock = threading.Lock()
+
+
+def _arrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("The local snapshot needs pyarrow (pip install pyarrow).")
+    return pa, pq
+
+
+def _duckdb():
+    try:
+        import duckdb
+    except ImportError:
+        raise RuntimeError("Local analytics needs duckdb (pip install duckdb).")
+    return duckdb
+
+
+def _state_file():
+    return os.path.join(SNAPSHOT_FOLDER, '_state.json')
+
+
+def _load_state():
+    try:
+        with open(_state_file(), encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _save_state(state):
+    os.makedirs(SNAPSHOT_FOLDER, exist_ok=True)
+    tmp = _state_file() + ".tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp, _state_file())
+
+
+def _schema(table, with_updated_at=False):
+    pa, _ = _arrow()
+    columns = TABLE_COLUMNS[table] + ([("updated_at", "string")] if with_updated_at else [])
+    return pa.schema([(name, getattr(pa, kind)()) for name, kind in columns])
+
+
+def _has_updated_at(table):
+    """True if the cloud table has an updated_at column (lets edits sync incrementally)."""
+    if table in APPEND_ONLY:
+        return False
+    try:
+        get_client().table(table).select("updated_at").limit(1).execute()
+        return True
+    except Exception as e:
+        # Anything else (network, auth) must not be saved as "no column": the
+        # table would be fully re-copied on every sync from then on
+        if not is_missing_column(e):
+            raise
+        return False
+
+
+def _write_part(table, pages, path, schema):
+    """Streams pages into one Parquet file. Returns (rows, max id, max updated_at)."""
+    pa, pq = _arrow()
+    rows, max_id, max_updated = 0, None, None
+    writer = None
+    try:
+        for page in pages:
+            if writer is None:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                writer = pq.ParquetWriter(path, schema)
+            writer.write_table(pa.Table.from_pylist(page, schema=schema))
+            rows += len(page)
+            max_id = max([max_id or 0] + [r['id'] for r in page])
+            if "updated_at" in schema.names:
+                stamps = [str(r['updated_at']) for r in page if r.get('updated_at')]
+                if stamps:
+                    max_updated = max([max_updated or ""] + stamps)
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows, max_id, max_updated
+
+
+def sync_table(table, full=False):
+    """
+    Brings one table's snapshot up to date. Returns the number of rows fetched.
+    Append-only tables fetch rows past the id watermark, tables with updated_at fetch
+    rows past the updated_at watermark, anything else is re-copied in full.
+    """
+    with _lock:
+        state = _load_state()
+        entry = state.get(table)
+        now = time.time()
+        if entry is not None and not full and now - entry["synced_at"] < MIN_SYNC_SECONDS:
+            return 0
+
+        if entry is None:
+            entry = {"parts": [], "seq": 0, "last_id": 0, "updated_at": None,
+                     "has_updated_at": _has_updated_at(table), "reconciled_at": 0}
+        incremental = table in APPEND_ONLY or entry["has_updated_at"]
+        full = (full or not entry["parts"] or not incremental or len(entry["parts"]) >= MAX_PARTS
+                or now - entry["reconciled_at"] > RECONCILE_SECONDS
+                or (table not in APPEND_ONLY and entry["updated_at"] is None))
+
+        if full:
+            query = None
+        elif table in APPEND_ONLY:
+            query = lambda q: q.gt("id", entry["last_id"])  # noqa: E731
+        else:
+            query = lambda q: q.gt("updated_at", entry["updated_at"])  # noqa: E731
+
+        entry["seq"] += 1
+        name = f"part-{entry['seq']:06d}.parquet"
+        path = os.path.join(SNAPSHOT_FOLDER, table, name)
+        schema = _schema(table, entry["has_updated_at"])
+        rows, max_id, max_updated = _write_part(table, iter_pages(table, "*", query=query), path, schema)
+
+        if full:
+            old_parts = entry["parts"]
+            entry["parts"] = [name] if rows else []
+            entry["last_id"] = max_id or 0
+            entry["updated_at"] = max_updated
+            entry["reconciled_at"] = now
+            for old in old_parts:
+                try:
+                    os.remove(os.path.join(SNAPSHOT_FOLDER, table, old))
+                except FileNotFoundError:
+                    pass
+        elif rows:
+            entry["parts"].append(name)
+            entry["last_id"] = max(entry["last_id"], max_id or 0)
+            entry["updated_at"] = max_updated or entry["updated_at"]
+
+        entry["synced_at"] = now
+        entry["rows"] = rows if full else entry.get("rows", 0) + rows
+        state[table] = entry
+        _save_state(state)
+        return rows
+
+
+def sync(tables=None, full=False):
+    """Syncs several tables (default: all). Returns {table: rows fetched}."""
+    return {table: sync_table(table, full) for table in (tables or TABLE_COLUMNS)}
+
+
+def is_available():
+    """True once a snapshot has been taken and pyarrow + duckdb are installed."""
+    if not os.path.exists(_state_file()):
+        return False
+    try:
+        _arrow()
+        _duckdb()
+    except RuntimeError:
+        return False
+    return True
+
+
+def tables_in(sql_query):
+    lowered = sql_query.lower()
+    return [t for t in TABLE_COLUMNS if re.search(r"\b" + t + r"\b", lowered)]
+
+
+def connect():
+    """
+    In-memory DuckDB connection with one view per table over its Parquet parts.
+    Tables synced by updated_at keep only the newest copy of each row.
+    Once the views exist, file access is limited to the snapshot folder and the
+    settings are locked: ask_database runs model-written SQL here, which must not
+    be able to read_text('.env') or any other local file.
+    """
+    duckdb = _duckdb()
+    conn = duckdb.connect()
+    state = _load_state()
+    for table, columns in TABLE_COLUMNS.items():
+        entry = state.get(table) or {}
+        files = [os.path.join(SNAPSHOT_FOLDER, table, p) for p in entry.get("parts", [])]
+        if not files:
+            conn.register(table, _schema(table).empty_table())
+            continue
+
+        file_list = ", ".join("'" + f.replace("'", "''") + "'" for f in files)
+        source = f"read_parquet([{file_list}], filename = true)"
+        if entry.get("has_updated_at"):
+            # Part names sort by sync order, so the last file holds the latest version of a row
+            source = f"(SELECT * FROM {source} QUALIFY row_number() OVER (PARTITION BY id ORDER BY filename DESC) = 1)"
+        cast = " REPLACE (TRY_CAST(date AS DATE) AS date)" if any(c == "date" for c, _ in columns) else ""
+        conn.execute(f"CREATE VIEW {table} AS SELECT * EXCLUDE (filename){cast} FROM {source}")
+
+    allowed = os.path.join(SNAPSHOT_FOLDER, "").replace("'", "''")
+    conn.execute(f"SET allowed_directories = ['{allowed}']")
+    conn.execute("SET enable_external_access = false")
+    conn.execute("SET lock_configuration = true")
+    return conn
+
+
+def query(sql_query, params=None, sync_first=True):
+    """Runs a read-only query on the snapshot. Returns (columns, rows)."""
+    tables = tables_in(sql_query)
+    if sync_first and tables:
+        sync(tables)
+    conn = connect()
+    try:
+        cursor = conn.execute(sql_query, params or [])
+        columns = [desc[0] for desc in cursor.description or ()]
+        return columns, cursor.fetchall()
+    finally:
+        conn.close()
+
+
+def describe():
+    """One line per table: rows, parts and when it was last synced."""
+    state = _load_state()
+    lines = []
+    for table in TABLE_COLUMNS:
+        entry = state.get(table)
+        if entry is None:
+            lines.append(f"• {table}: not synced")
+            continue
+        synced = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(entry["synced_at"]))
+        mode = "id" if table in APPEND_ONLY else ("updated_at" if entry["has_updated_at"] else "full copy")
+        lines.append(f"• {table}: ~{entry.get('rows', 0)} rows in {len(entry['parts'])} part(s) | "
+                     f"sync by {mode} | last sync {synced}")
+    return "\n".join(lines)
@@ -1,5 +1,23 @@
+import threading
+import time
 from datetime import date
-from modules.database import get_client
+from modules.database import get_client, bump_table_version, is_missing_function
+from modules import finance_manager, ledger, write_journal
+from modules.fuzzy_index import TrigramIndex
+
+# Keywords the agent uses when it means the user themself
+SELF_ALIASES = {"me", "i", "myself", "user", "self", "you"}
+
+# --- FRIEND DIRECTORY CACHE ---
+# name -> id index shared by every tool call in this process.
+# Reloaded from the cloud when older than FRIEND_CACHE_TTL seconds.
+FRIEND_CACHE_TTL = 300
+
+_friend_index = {}
+_friend_names = {}
+_friend_trigrams = TrigramIndex()
+_friend_cache_loaded_at = 0.0
+_friend_cache_lock = threading.Lock()
 
 
 def normalize_name(name):
@@ -8,32 +26,94 @@ def normalize_name(name):
     return str(name).lower().strip()
 
 
+def _load_friend_index():
+    """Downloads the friends table once and rebuilds the name -> id index."""
+    global _friend_index, _friend_names, _friend_cache_loaded_at
+
+    supabase = get_client()
+    response = supabase.table("friends").select("id, name").execute()
+
+    _friend_index = {normalize_name(f['name']): f['id'] for f in response.data}
+    _friend_names = {f['id']: f['name'] for f in response.data}
+
+    _friend_trigrams.clear()
+    for f in response.data:
+        _friend_trigrams.add(normalize_name(f['name']), f['name'])
+    _friend_cache_loaded_at = time.monotonic()
+
+
+def _get_friend_index():
+    """Returns the cached index, refreshing it when empty or expired."""
+    with _friend_cache_lock:
+        expired = (time.monotonic() - _friend_cache_loaded_at) > FRIEND_CACHE_TTL
+        if not _friend_index or expired:
+            _load_friend_index()
+        return _friend_index
+
+
+def invalidate_friend_cache():
+    """Forces the next lookup to reload the friends table."""
+    global _friend_cache_loaded_at
+    with _friend_cache_lock:
+        _friend_cache_loaded_at = 0.0
+
+
 def get_friend_id(name):
     """
-    Resolves name to ID.
-    Handles 'Me' -> Fetches the actual ID for 'Me' from the database.
+    Resolves name to ID using the in-memory friend directory.
+    Handles 'Me' -> resolves the keyword aliases without a network round trip.
     """
     clean_name = normalize_name(name)
 
     # 1. Handle Self (User) - Redirect to "Me"
-    if clean_name in ["me", "i", "myself", "user", "self", "you"]:
+    if clean_name in SELF_ALIASES:
         clean_name = normalize_name("Me")
 
-    # 2. Query Database
-    supabase = get_client()
+    # 2. Look up the cached directory (loads once, then every FRIEND_CACHE_TTL seconds)
     try:
-        # Fetch all friends to find the matching name
-        # Optimization: For large lists, we could use .ilike('name', clean_name)
-        response = supabase.table("friends").select("id, name").execute()
+        return _get_friend_index().get(clean_name)
+    except Exception as e:
+        print(f"❌ Error looking up friend: {e}")
+
+    return None
 
-        for f in response.data:
-            if normalize_name(f['name']) == clean_name:
-                return f['id']
 
+def suggest_friends(name, limit=3):
+    """Closest registered names for a misspelt one ("Prathm" -> ["Pratham"])."""
+    try:
+        _get_friend_index()
     except Exception as e:
         print(f"❌ Error looking up friend: {e}")
+        return []
+    return [display for _, display, _ in _friend_trigrams.search(normalize_name(name), limit)]
 
-    return None
+
+def list_friend_names():
+    """Display names of every registered friend, as stored (from the cached directory)."""
+    try:
+        _get_friend_index()
+    except Exception as e:
+        print(f"❌ Error looking up friend: {e}")
+        return []
+    return list(_friend_names.values())
+
+
+def _not_found(name):
+    """Standard 'not found' message, with suggestions when we have close matches."""
+    message = f"❌ Error: Friend '{name}' not found."
+    suggestions = suggest_friends(name)
+    if suggestions:
+        return message + f" Did you mean: {', '.join(suggestions)}?"
+    return message + " Please add them first."
+
+
+def get_friend_name(friend_id):
+    """Reverse lookup: ID -> display name (from the same cached directory)."""
+    try:
+        _get_friend_index()
+    except Exception as e:
+        print(f"❌ Error looking up friend: {e}")
+    return _friend_names.get(friend_id, f"#{friend_id}")
 
 
 def add_friend(name, phone=None):
@@ -46,7 +126,18 @@ def add_friend(name, phone=None):
 
     try:
         data = {"name": clean_name, "phone": phone}
-        supabase.table("friends").insert(data).execute()
+        response = supabase.table("friends").insert(data).execute()
+        bump_table_version("friends")
+
+        # Keep the directory in sync without reloading the whole table
+        if response.data:
+            with _friend_cache_lock:
+                _friend_index[normalize_name(clean_name)] = response.data[0]['id']
+                _friend_names[response.data[0]['id']] = clean_name
+                _friend_trigrams.add(normalize_name(clean_name), clean_name)
+        else:
+            invalidate_friend_cache()
+
         return f"✅ Friend added: {clean_name}"
 
     except Exception as e:
@@ -73,12 +164,11 @@ def log_debt(borrower_name, lender_name, amount, description="General Loan"):
 
         # --- VALIDATION ---
         if borrower_id is None:
-            return f"❌ Error: Friend '{borrower_name}' not found. Please add them first."
+            return _not_found(borrower_name)
         if lender_id is None:
-            return f"❌ Error: Friend '{lender_name}' not found. Please add them first."
+            return _not_found(lender_name)
 
         # --- SAVE TO DB ---
-        supabase = get_client()
         today = date.today().strftime("%Y-%m-%d")
 
         data = {
@@ -90,7 +180,8 @@ def log_debt(borrower_name, lender_name, amount, description="General Loan"):
             "status": "Active"
         }
 
-        supabase.table("debts").insert(data).execute()
+        saved = write_journal.insert("debts", data)
+        ledger.apply_debt(saved[0].get('id') if saved else None, borrower_id, lender_id, amount)
 
         return f"✅ Success: {borrower_name} owes {lender_name} ₹{amount}"
 
@@ -98,16 +189,177 @@ def log_debt(borrower_name, lender_name, amount, description="General Loan"):
         return f"❌ Database Exception: {str(e)}"
 
 
+def split_shares(total, weights):
+    """
+    Splits total by weights, rounded to paise so the shares add up exactly.
+    The leftover paise go to the largest fractional parts.
+    """
+    total_paise = int(round(float(total) * 100))
+    weight_sum = float(sum(weights))
+    raw = [total_paise * w / weight_sum for w in weights]
+    paise = [int(r) for r in raw]
+
+    leftover = total_paise - sum(paise)
+    by_fraction = sorted(range(len(raw)), key=lambda i: raw[i] - paise[i], reverse=True)
+    for i in by_fraction[:leftover]:
+        paise[i] += 1
+    return [p / 100 for p in paise]
+
+
+def split_expense(payer_name, total, participants, description="Split Bill",
+                  weights=None, category="Food", is_healthy=None):
+    """
+    Splits a bill: every participant except the payer owes the payer their share.
+    If the user paid, their own share is also logged as a personal expense.
+    All debts are written in one bulk insert, after the expense.
+    """
+    try:
+        if total is None or float(total) <= 0:
+            return "❌ Error: The bill total must be more than 0."
+        if not participants:
+            return "❌ Error: No participants given."
+        if weights is not None and len(weights) != len(participants):
+            return "❌ Error: Give one weight per participant."
+        if weights is not None and (any(w < 0 for w in weights) or sum(weights) <= 0):
+            return "❌ Error: Weights must be positive."
+
+        # --- RESOLVE IDS (one cached directory lookup for everyone) ---
+        payer_id = get_friend_id(payer_name)
+        if payer_id is None:
+            return _not_found(payer_name)
+
+        participant_ids = [get_friend_id(p) for p in participants]
+        missing = [p for p, pid in zip(participants, participant_ids) if pid is None]
+        if missing:
+            return "\n".join(_not_found(p) for p in missing)
+
+        shares = split_shares(total, weights or [1] * len(participants))
+        me_id = get_friend_id("Me")
+        today = date.today().strftime("%Y-%m-%d")
+
+        # --- PAYER'S OWN SHARE (only tracked when the user paid) ---
+        expense = None
+        if payer_id == me_id and payer_id in participant_ids:
+            my_share = sum(s for pid, s in zip(participant_ids, shares) if pid == payer_id)
+            if is_healthy is None:
+                is_healthy = finance_manager.check_item_health(description)
+                if is_healthy is None:
+                    return (f"NEEDS_CLARIFICATION: I don't know if '{description}' is healthy. "
+                            f"Nothing was saved yet.")
+            expense = {"date": today, "item": description, "amount": my_share,
+                       "category": category, "is_healthy": is_healthy}
+
+        debt_rows = [
+            {
+                "date": today,
+                "borrower_id": pid,
+                "lender_id": payer_id,
+                "amount": share,
+                "description": description,
+                "status": "Active"
+            }
+            for pid, share in zip(participant_ids, shares)
+            if pid != payer_id and share > 0
+        ]
+
+        # --- SAVE TO DB (expense first, then one bulk insert for all debts) ---
+        if expense is not None:
+            write_journal.insert("expenses", expense)
+            finance_manager.update_rollups([expense])
+
+        if debt_rows:
+            try:
+                saved = write_journal.insert("debts", debt_rows)
+            except Exception as e:
+                if expense is None:
+                    raise
+                return (f"⚠️ Your share (₹{expense['amount']}) was logged as an expense, "
+                        f"but the debts were NOT saved: {str(e)}")
+            for row, saved_row in zip(debt_rows, saved or [{}] * len(debt_rows)):
+                ledger.apply_debt(saved_row.get('id'), row['borrower_id'], payer_id, row['amount'])
+
+        lines = [f"✅ Split ₹{float(total):,.2f} for '{description}' paid by {payer_name}:"]
+        for name, pid, share in zip(participants, participant_ids, shares):
+            if pid == payer_id:
+                lines.append(f"   • {name}: ₹{share} (own share)")
+            else:
+                lines.append(f"   • {name} owes {payer_name} ₹{share}")
+        return "\n".join(lines)
+
+    except Exception as e:
+        return f"❌ Database Exception: {str(e)}"
+
+
+def allocate_payment(active_debts, paid_by_debt, payment_amount):
+    """
+    Splits a payback across debts, oldest first (FIFO).
+    Returns (allocations, settled_ids, leftover) where allocations is a list of
+    (debt_id, amount) pairs. Pure function - no database access.
+    """
+    remaining = float(payment_amount)
+    allocations = []
+    settled_ids = []
+
+    for debt in active_debts:
+        if remaining <= 0: break
+
+        already_paid = paid_by_debt.get(debt['id'], 0.0)
+        balance = float(debt['amount']) - already_paid
+        pay_chunk = min(remaining, balance)
+
+        if pay_chunk > 0:
+            allocations.append((debt['id'], pay_chunk))
+            if (already_paid + pay_chunk) >= float(debt['amount']):
+                settled_ids.append(debt['id'])
+            remaining -= pay_chunk
+
+    return allocations, settled_ids, remaining
+
+
+def _commit_settlement(supabase, payment_rows, settled_ids):
+    """
+    Writes all payment rows and status changes together.
+    Uses the transactional 'settle_payment' RPC (see sql/settle_payment.sql);
+    if it is not deployed, falls back to one bulk insert + one bulk update.
+    Any other error is re-raised: the RPC may have committed before failing
+    (e.g. a timeout), and the fallback would record the payments twice.
+    """
+    try:
+        supabase.rpc("settle_payment", {
+            "payment_rows": payment_rows,
+            "settled_ids": settled_ids
+        }).execute()
+        bump_table_version("payments", "debts")
+        return
+    except Exception as e:
+        if not is_missing_function(e):
+            raise
+        print(f"⚠️ settle_payment RPC unavailable, using bulk writes: {e}")
+
+    supabase.table("payments").insert(payment_rows).execute()
+    if settled_ids:
+        supabase.table("debts").update({"status": "Settled"}).in_("id", settled_ids).execute()
+    bump_table_version("payments", "debts")
+
+
 def record_payment(payer_name, receiver_name, payment_amount):
     try:
         supabase = get_client()
         payer_id = get_friend_id(payer_name)
         receiver_id = get_friend_id(receiver_name)
 
-        if payer_id is None or receiver_id is None:
-            return "❌ Error: Friend not found."
+        if payer_id is None:
+            return _not_found(payer_name)
+        if receiver_id is None:
+            return _not_found(receiver_name)
 
-        # Find active debts where the payer is the borrower
+        # 0. Debts queued in offline mode must reach the cloud before we settle them
+        if write_journal.OFFLINE_WRITES:
+            write_journal.flush()
+            if write_journal.pending_count("debts"):
+                return "⚠️ Offline: queued debts are not synced yet. Try the payment again once online."
+
+        # 1. Find active debts where the payer is the borrower
         res = supabase.table("debts").select("id, amount") \
             .eq("borrower_id", payer_id) \
             .eq("lender_id", receiver_id) \
@@ -118,36 +370,70 @@ def record_payment(payer_name, receiver_name, payment_amount):
         if not active_debts:
             return f"⚠️ No active debts found for {payer_name} -> {receiver_name}."
 
-        remaining = float(payment_amount)
-        today = date.today().strftime("%Y-%m-%d")
-        messages = []
+        # 2. Fetch previous payments for ALL of these debts in one request
+        debt_ids = [d['id'] for d in active_debts]
+        paid_res = supabase.table("payments").select("debt_id, amount").in_("debt_id", debt_ids).execute()
 
-        for debt in active_debts:
-            if remaining <= 0: break
+        paid_by_debt = {}
+        for p in paid_res.data:
+            paid_by_debt[p['debt_id']] = paid_by_debt.get(p['debt_id'], 0.0) + float(p['amount'])
 
-            # Check previously paid amount
-            paid_res = supabase.table("payments").select("amount").eq("debt_id", debt['id']).execute()
-            already_paid = sum(float(p['amount']) for p in paid_res.data)
+        # 3. Compute the FIFO allocation locally
+        allocations, settled_ids, _ = allocate_payment(active_debts, paid_by_debt, payment_amount)
+        if not allocations:
+            return f"⚠️ Nothing left to pay for {payer_name} -> {receiver_name}."
 
-            balance = float(debt['amount']) - already_paid
-            pay_chunk = min(remaining, balance)
-
-            if pay_chunk > 0:
-                p_data = {
-                    "date": today,
-                    "debt_id": debt['id'],
-                    "payer_id": payer_id,
-                    "amount": pay_chunk
-                }
-
-                supabase.table("payments").insert(p_data).execute()
-
-                if (already_paid + pay_chunk) >= float(debt['amount']):
-                    supabase.table("debts").update({"status": "Settled"}).eq("id", debt['id']).execute()
-                    messages.append(f"Settled Debt #{debt['id']}")
+        today = date.today().strftime("%Y-%m-%d")
+        payment_rows = [
+            {"date": today, "debt_id": debt_id, "payer_id": payer_id, "amount": chunk}
+            for debt_id, chunk in allocations
+        ]
 
-                remaining -= pay_chunk
+        # 4. Commit every payment row and status change at once
+        _commit_settlement(supabase, payment_rows, settled_ids)
+        ledger.apply_payment(payer_id, receiver_id, allocations)
 
+        messages = [f"Settled Debt #{debt_id}" for debt_id in settled_ids]
         return f"✅ Payment recorded. {', '.join(messages)}"
     except Exception as e:
-        return f"❌ Error logging payment: {str(e)}"
\ No newline at end of file
+        return f"❌ Error logging payment: {str(e)}"
+
+
+def balance_report(person=None):
+    """Net balances against 'Me' from the in-memory ledger (no ledger RPC)."""
+    me_id = get_friend_id("Me")
+    if me_id is None:
+        return "❌ Error: Friend 'Me' not found. Please add them first."
+
+    balances = ledger.net_balances(me_id)
+    if person:
+        person_id = get_friend_id(person)
+        if person_id is None:
+            return _not_found(person)
+        balances = {person_id: balances.get(person_id, 0.0)}
+
+    lines = ["--- Social Report (BALANCE) ---"]
+    for other_id, amount in sorted(balances.items(), key=lambda kv: -kv[1]):
+        name = get_friend_name(other_id)
+        if amount > 0:
+            lines.append(f"💰 {name} owes: ₹{amount}")
+        elif amount < 0:
+            lines.append(f"💸 You owe {name}: ₹{-amount}")
+        else:
+            lines.append(f"✅ {name} and you are settled up.")
+
+    if len(lines) == 1:
+        return f"No records found for '{person or 'everyone'}' in mode BALANCE."
+    return "\n".join(lines)
+
+
+def settle_up_plan():
+    """Fewest payments that clear every open debt in the group."""
+    plan = ledger.simplify()
+    if not plan:
+        return "✅ Everyone is settled up."
+
+    lines = ["--- Settle-Up Plan ---"]
+    for payer_id, receiver_id, amount in plan:
+        lines.append(f"➡️ {get_friend_name(payer_id)} pays {get_friend_name(receiver_id)}: ₹{amount}")
+    return "\n".join(lines)
@@ -0,0 +1,461 @@
+import os
+import re
+import sqlite3
+import threading
+from datetime import date, timedelta
+
+# --- LOCAL SQLITE BACKEND ---
+# A drop-in replacement for the Supabase client: same table()/rpc() entry points and
+# the subset of the PostgREST query builder PyLife uses, compiled to SQL on a local
+# file. Enabled with PYLIFE_BACKEND=sqlite (see modules/database.py).
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
+DB_FILE = os.getenv("PYLIFE_SQLITE_FILE", os.path.join(PROJECT_ROOT, 'data', 'tracker.db'))
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS friends (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT UNIQUE NOT NULL,
+    phone TEXT
+);
+
+CREATE TABLE IF NOT EXISTS expenses (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    date TEXT NOT NULL,
+    item TEXT NOT NULL,
+    amount REAL NOT NULL,
+    category TEXT,
+    is_healthy BOOLEAN
+);
+CREATE INDEX IF NOT EXISTS idx_expenses_date ON expenses (date);
+
+CREATE TABLE IF NOT EXISTS item_health (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    item TEXT UNIQUE NOT NULL COLLATE NOCASE,
+    is_healthy BOOLEAN NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS debts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    date TEXT NOT NULL,
+    borrower_id INTEGER NOT NULL,
+    lender_id INTEGER NOT NULL,
+    amount REAL NOT NULL,
+    description TEXT,
+    status TEXT DEFAULT 'Active',
+    FOREIGN KEY (borrower_id) REFERENCES friends (id),
+    FOREIGN KEY (lender_id) REFERENCES friends (id)
+);
+CREATE INDEX IF NOT EXISTS idx_debts_borrower ON debts (borrower_id, lender_id, status);
+CREATE INDEX IF NOT EXISTS idx_debts_lender ON debts (lender_id, status);
+
+CREATE TABLE IF NOT EXISTS payments (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    date TEXT NOT NULL,
+    debt_id INTEGER NOT NULL,
+    payer_id INTEGER NOT NULL,
+    amount REAL NOT NULL,
+    FOREIGN KEY (debt_id) REFERENCES debts (id),
+    FOREIGN KEY (payer_id) REFERENCES friends (id)
+);
+CREATE INDEX IF NOT EXISTS idx_payments_debt ON payments (debt_id);
+
+CREATE TABLE IF NOT EXISTS workouts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%S', 'now', 'localtime')),
+    workout_type TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_workouts_created ON workouts (created_at);
+
+CREATE TABLE IF NOT EXISTS nutrition_logs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%S', 'now', 'localtime')),
+    item_name TEXT NOT NULL,
+    protein_g INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_nutrition_created ON nutrition_logs (created_at);
+'''
+
+# SQLite stores booleans as 0/1; Supabase hands back true/false
+BOOL_COLUMNS = {"is_healthy"}
+
+_IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+def _quote(name):
+    """
+    Quotes a table/column name (only plain identifiers are allowed).
+    Brackets rather than double quotes: SQLite reads an unknown double-quoted
+    name as a string literal, so a misspelt column would silently match nothing.
+    """
+    name = name.strip()
+    if not _IDENTIFIER.match(name):
+        raise ValueError(f"Invalid identifier: {name!r}")
+    return f'[{name}]'
+
+
+def _to_dict(row):
+    data = dict(row)
+    for col in BOOL_COLUMNS.intersection(data):
+        if data[col] is not None:
+            data[col] = bool(data[col])
+    return data
+
+
+class Response:
+    """Mimics postgrest's APIResponse (.data, .count)."""
+
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+class SQLiteQuery:
+    """Query builder with the PostgREST methods PyLife uses; execute() runs one statement."""
+
+    def __init__(self, client, table):
+        self.client = client
+        self.table_name = _quote(table)
+        self.action = "select"
+        self.columns = "*"
+        self.count_mode = None
+        self.where = []
+        self.params = []
+        self.order_by = []
+        self.limit_n = None
+        self.range_ = None
+        self.payload = None
+        self.on_conflict = None
+
+    # --- actions ---
+    def select(self, columns="*", count=None):
+        self.action, self.count_mode = "select", count
+        self.columns = "*" if columns.strip() == "*" else ", ".join(_quote(c) for c in columns.split(","))
+        return self
+
+    def insert(self, rows):
+        self.action, self.payload = "insert", rows
+        return self
+
+    def upsert(self, rows, on_conflict=None):
+        self.action, self.payload, self.on_conflict = "upsert", rows, on_conflict
+        return self
+
+    def update(self, values):
+        self.action, self.payload = "update", values
+        return self
+
+    def delete(self):
+        self.action = "delete"
+        return self
+
+    # --- filters ---
+    def _filter(self, clause, *params):
+        self.where.append(clause)
+        self.params.extend(params)
+        return self
+
+    def eq(self, col, value):
+        return self._filter(f"{_quote(col)} = ?", value)
+
+    def neq(self, col, value):
+        return self._filter(f"{_quote(col)} <> ?", value)
+
+    def gt(self, col, value):
+        return self._filter(f"{_quote(col)} > ?", value)
+
+    def gte(self, col, value):
+        return self._filter(f"{_quote(col)} >= ?", value)
+
+    def lt(self, col, value):
+        return self._filter(f"{_quote(col)} < ?", value)
+
+    def lte(self, col, value):
+        return self._filter(f"{_quote(col)} <= ?", value)
+
+    def in_(self, col, values):
+        values = list(values)
+        if not values:
+            return self._filter("0")
+        return self._filter(f"{_quote(col)} IN ({', '.join('?' * len(values))})", *values)
+
+    def is_(self, col, value):
+        if value in (None, "null"):
+            return self._filter(f"{_quote(col)} IS NULL")
+        return self._filter(f"{_quote(col)} IS ?", value in (True, "true"))
+
+    def ilike(self, col, pattern):
+        # SQLite's LIKE is already case-insensitive for ASCII
+        return self._filter(f"{_quote(col)} LIKE ?", pattern)
+
+    def order(self, col, desc=False):
+        self.order_by.append(f"{_quote(col)} {'DESC' if desc else 'ASC'}")
+        return self
+
+    def limit(self, n):
+        self.limit_n = int(n)
+        return self
+
+    def range(self, start, end):
+        self.range_ = (int(start), int(end))
+        return self
+
+    # --- execution ---
+    def _where_sql(self):
+        return f" WHERE {' AND '.join(self.where)}" if self.where else ""
+
+    def _select(self, conn):
+        sql = f"SELECT {self.columns} FROM {self.table_name}{self._where_sql()}"
+        if self.order_by:
+            sql += " ORDER BY " + ", ".join(self.order_by)
+        params = list(self.params)
+        if self.range_ is not None:
+            start, end = self.range_
+            limit = end - start + 1 if self.limit_n is None else min(self.limit_n, end - start + 1)
+            sql += " LIMIT ? OFFSET ?"
+            params += [limit, start]
+        elif self.limit_n is not None:
+            sql += " LIMIT ?"
+            params.append(self.limit_n)
+        data = [_to_dict(r) for r in conn.execute(sql, params)]
+
+        count = None
+        if self.count_mode:
+            count = conn.execute(f"SELECT COUNT(*) FROM {self.table_name}{self._where_sql()}",
+                                 self.params).fetchone()[0]
+        return Response(data, count)
+
+    def _insert(self, conn):
+        rows = self.payload if isinstance(self.payload, list) else [self.payload]
+        out = []
+        with conn:
+            for row in rows:
+                cols = [_quote(c) for c in row]
+                sql = f"INSERT INTO {self.table_name} ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))})"
+                if self.action == "upsert":
+                    target = _quote(self.on_conflict or "id")
+                    updates = ", ".join(f"{c} = excluded.{c}" for c in cols if c != target)
+                    sql += f" ON CONFLICT ({target}) DO " + (f"UPDATE SET {updates}" if updates else "NOTHING")
+                out.extend(_to_dict(r) for r in conn.execute(sql + " RETURNING *", list(row.values())))
+        return Response(out)
+
+    def _update(self, conn):
+        cols = list(self.payload)
+        sets = ", ".join(f"{_quote(c)} = ?" for c in cols)
+        params = [self.payload[c] for c in cols] + self.params
+        with conn:
+            rows = conn.execute(f"UPDATE {self.table_name} SET {sets}{self._where_sql()} RETURNING *", params)
+            return Response([_to_dict(r) for r in rows])
+
+    def _delete(self, conn):
+        with conn:
+            rows = conn.execute(f"DELETE FROM {self.table_name}{self._where_sql()} RETURNING *", self.params)
+            return Response([_to_dict(r) for r in rows])
+
+    def execute(self):
+        conn = self.client.connection()
+        try:
+            if self.action == "select":
+                return self._select(conn)
+            if self.action in ("insert", "upsert"):
+                return self._insert(conn)
+            if self.action == "update":
+                return self._update(conn)
+            return self._delete(conn)
+        except sqlite3.OperationalError as e:
+            # Same wording as PostgREST (42703), which callers check for
+            match = re.match(r"(?:no such column|table \S+ has no column named):? (\w+)", str(e))
+            if match:
+                raise Exception(f"column {self.table_name.strip('[]')}.{match.group(1)} does not exist") from e
+            raise
+
+
+class SQLiteRPC:
+    def __init__(self, client, name, params):
+        self.client, self.name, self.params = client, name, params or {}
+
+    def execute(self):
+        func = RPCS.get(self.name)
+        if func is None:
+            raise Exception(f"Could not find the function public.{self.name} in the schema cache")
+        return Response(func(self.client.connection(), self.params))
+
+
+class SQLiteClient:
+    """
+    Local stand-in for the Supabase client (one connection per thread, WAL mode).
+    Creates the schema on first use.
+    """
+
+    def __init__(self, path=None):
+        if sqlite3.sqlite_version_info < (3, 35):
+            raise RuntimeError(f"The SQLite backend needs SQLite 3.35+ (found {sqlite3.sqlite_version}).")
+        self.path = path or DB_FILE
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+
+    def connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            with self._schema_lock:
+                if not self._schema_ready:
+                    conn.executescript(SCHEMA)
+                    self._schema_ready = True
+            self._local.conn = conn
+        return conn
+
+    def table(self, name):
+        return SQLiteQuery(self, name)
+
+    def rpc(self, name, params=None):
+        return SQLiteRPC(self, name, params)
+
+
+# --- Local versions of the Postgres functions the tools call ---
+
+def rpc_settle_payment(conn, params):
+    """Same effect as sql/settle_payment.sql: insert payments, mark debts settled, atomically."""
+    rows = params.get("payment_rows") or []
+    settled = list(params.get("settled_ids") or [])
+    with conn:
+        conn.executemany(
+            "INSERT INTO payments (date, debt_id, payer_id, amount) VALUES (?, ?, ?, ?)",
+            [(r['date'], r['debt_id'], r['payer_id'], r['amount']) for r in rows]
+        )
+        if settled:
+            conn.execute(f"UPDATE debts SET status = 'Settled' WHERE id IN ({', '.join('?' * len(settled))})",
+                         settled)
+    return None
+
+
+def rpc_get_expense_stats(conn, params):
+    """Totals per category and health status for one 'YYYY-MM' month (default: current month)."""
+    month = params.get("target_month") or date.today().strftime("%Y-%m")
+    rows = conn.execute('''
+        SELECT category,
+               CASE WHEN is_healthy THEN 'Healthy' ELSE 'Unhealthy' END AS health_status,
+               ROUND(SUM(amount), 2) AS total_spent
+        FROM expenses
+        WHERE date >= ? AND date < ?
+        GROUP BY category, health_status
+        ORDER BY category, health_status
+    ''', (f"{month}-01", f"{month}-32"))
+    return [dict(r) for r in rows]
+
+
+def rpc_query_social_ledger(conn, params):
+    """
+    HISTORY: debts and payments involving a person (or everyone), oldest first.
+    BALANCE: what each borrower still owes on their active debts.
+    """
+    person = params.get("target_person")
+    if (params.get("query_mode") or "").upper() == "BALANCE":
+        sql = '''
+            SELECT f.name AS person, ROUND(SUM(d.amount - COALESCE(p.paid, 0)), 2) AS amount
+            FROM debts d
+            JOIN friends f ON f.id = d.borrower_id
+            LEFT JOIN (SELECT debt_id, SUM(amount) AS paid FROM payments GROUP BY debt_id) p ON p.debt_id = d.id
+            WHERE d.status = 'Active' AND (? IS NULL OR f.name LIKE ?)
+            GROUP BY f.name
+            HAVING amount > 0
+            ORDER BY amount DESC
+        '''
+        return [dict(r) for r in conn.execute(sql, (person, person))]
+
+    sql = '''
+        SELECT d.date, b.name AS person, COALESCE(d.description, 'Loan') AS description, d.amount
+        FROM debts d
+        JOIN friends b ON b.id = d.borrower_id
+        JOIN friends l ON l.id = d.lender_id
+        WHERE ? IS NULL OR b.name LIKE ? OR l.name LIKE ?
+        UNION ALL
+        SELECT p.date, f.name AS person, 'Payment' AS description, p.amount
+        FROM payments p
+        JOIN friends f ON f.id = p.payer_id
+        JOIN debts d ON d.id = p.debt_id
+        JOIN friends l ON l.id = d.lender_id
+        WHERE ? IS NULL OR f.name LIKE ? OR l.name LIKE ?
+        ORDER BY date
+    '''
+    return [dict(r) for r in conn.execute(sql, (person,) * 6)]
+
+
+def rpc_get_fitness_stats(conn, params):
+    """One row per day for the last 'days_back' days: gym sessions and protein grams."""
+    days = max(1, int(params.get("days_back") or 7))
+    today = date.today()
+    start = (today - timedelta(days=days - 1)).isoformat()
+
+    gym = dict(conn.execute(
+        "SELECT substr(created_at, 1, 10) AS day, COUNT(*) FROM workouts WHERE created_at >= ? GROUP BY day",
+        (start,)).fetchall())
+    protein = dict(conn.execute(
+        "SELECT substr(created_at, 1, 10) AS day, SUM(protein_g) FROM nutrition_logs WHERE created_at >= ? GROUP BY day",
+        (start,)).fetchall())
+
+    rows = []
+    for offset in range(days - 1, -1, -1):
+        day = (today - timedelta(days=offset)).isoformat()
+        rows.append({"date": day, "gym_count": gym.get(day, 0), "protein_total": protein.get(day, 0)})
+    return rows
+
+
+def rpc_get_daily_spend(conn, params):
+    """Same rows as get_daily_spend in sql/dashboard_aggregates.sql."""
+    rows = conn.execute('''
+        SELECT date AS day, SUM(amount) AS total_spent,
+               COALESCE(SUM(CASE WHEN is_healthy THEN amount END), 0) AS healthy_spent,
+               COUNT(*) AS item_count, COUNT(CASE WHEN is_healthy THEN 1 END) AS healthy_count
+        FROM expenses
+        WHERE date BETWEEN ? AND ?
+        GROUP BY date
+        ORDER BY date
+    ''', (params['start_date'], params['end_date']))
+    return [dict(r) for r in rows]
+
+
+def rpc_get_category_spend(conn, params):
+    """Same rows as get_category_spend in sql/dashboard_aggregates.sql."""
+    rows = conn.execute('''
+        SELECT COALESCE(category, 'General') AS category,
+               CASE WHEN is_healthy THEN 'Healthy' ELSE 'Unhealthy' END AS health_status,
+               SUM(amount) AS total_spent, COUNT(*) AS item_count
+        FROM expenses
+        WHERE date BETWEEN ? AND ?
+        GROUP BY 1, 2
+        ORDER BY 1, 2
+    ''', (params['start_date'], params['end_date']))
+    return [dict(r) for r in rows]
+
+
+RPCS = {
+    "settle_payment": rpc_settle_payment,
+    "get_expense_stats": rpc_get_expense_stats,
+    "query_social_ledger": rpc_query_social_ledger,
+    "get_fitness_stats": rpc_get_fitness_stats,
+    "get_daily_spend": rpc_get_daily_spend,
+    "get_category_spend": rpc_get_category_spend,
+}
+
+
+def run_sql(query, path=None):
+    """
+    Runs a raw (read) query for the analyst on a separate read-only connection.
+    Returns (columns, rows). Postgres' ILIKE is mapped to SQLite's case-insensitive LIKE.
+    """
+    query = re.sub(r"\bILIKE\b", "LIKE", query, flags=re.IGNORECASE)
+    conn = sqlite3.connect(f"file:{path or DB_FILE}?mode=ro", uri=True, timeout=10)
+    try:
+        cursor = conn.execute(query)
+        columns = [desc[0] for desc in cursor.description or ()]
+        return columns, cursor.fetchall()
+    finally:
+        conn.close()
@@ -0,0 +1,452 @@
+import csv
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict
+from datetime import datetime
+from modules import finance_manager, write_journal
+
+# --- CONFIGURATION ---
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
+INDEX_FILE = os.path.join(PROJECT_ROOT, 'data', 'import_index.db')
+MERCHANT_RULES_FILE = os.path.join(PROJECT_ROOT, 'data', 'merchant_rules.json')
+
+BATCH_SIZE = 500          # rows per insert request
+OPEN_DATES = 31           # dates whose occurrence counters are kept (statements come sorted by date)
+OFX_CHUNK_SIZE = 64 * 1024
+FORMATS = ("csv", "ofx", "qif")
+
+# Merchant keyword -> (item, category, is_healthy or None to use the health knowledge base).
+# Only food counts as healthy spending, so non-food merchants are False up front instead of
+# holding every ride or bill back for a health answer. First match wins, so the more
+# specific keyword comes first ("jio mart" before "jio").
+# data/merchant_rules.json can add or override rules:
+#   [{"match": "chai point", "item": "chai", "category": "Food", "is_healthy": false}]
+DEFAULT_MERCHANT_RULES = [
+    ("swiggy", "swiggy order", "Food", None),
+    ("zomato", "zomato order", "Food", None),
+    ("dominos", "pizza", "Food", False),
+    ("mcdonalds", "burger", "Food", False),
+    ("mcdonald", "burger", "Food", False),
+    ("starbucks", "coffee", "Food", None),
+    ("blinkit", "groceries", "Groceries", None),
+    ("zepto", "groceries", "Groceries", None),
+    ("bigbasket", "groceries", "Groceries", None),
+    ("jiomart", "groceries", "Groceries", None),
+    ("jio mart", "groceries", "Groceries", None),
+    ("uber eats", "uber eats order", "Food", None),
+    ("uber", "uber ride", "Transport", False),
+    ("ola", "ola ride", "Transport", False),
+    ("rapido", "rapido ride", "Transport", False),
+    ("irctc", "train ticket", "Transport", False),
+    ("petrol", "fuel", "Transport", False),
+    ("amazon", "amazon order", "Shopping", False),
+    ("flipkart", "flipkart order", "Shopping", False),
+    ("netflix", "netflix", "Bills", False),
+    ("spotify", "spotify", "Bills", False),
+    ("airtel", "phone bill", "Bills", False),
+    ("jio", "phone bill", "Bills", False),
+    ("electricity", "electricity bill", "Bills", False),
+]
+
+# Words banks put around the merchant name (dropped when guessing an item name)
+BANK_NOISE = {"upi", "pos", "neft", "imps", "rtgs", "ach", "nach", "ecom", "txn", "ref", "dr", "cr",
+              "debit", "credit", "card", "purchase", "payment", "to", "from", "via", "ltd", "pvt", "inc",
+              "india", "www", "com", "in", "paytm", "gpay", "phonepe", "bhim"}
+
+DATE_FORMATS = ("%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y", "%d.%m.%Y", "%d/%m/%y", "%d-%m-%y",
+                "%d %b %Y", "%d-%b-%Y", "%d-%b-%y", "%d %B %Y", "%Y/%m/%d", "%Y%m%d")
+MONTH_FIRST_FORMATS = ("%m/%d/%Y", "%m-%d-%Y", "%m/%d/%y")
+
+CSV_DATE_COLUMNS = ("date", "transaction date", "txn date", "posted date", "posting date", "value date")
+CSV_DESCRIPTION_COLUMNS = ("description", "narration", "details", "transaction details", "merchant",
+                           "payee", "particulars", "remarks", "memo", "name")
+CSV_AMOUNT_COLUMNS = ("amount", "transaction amount", "amount (inr)", "amt")
+CSV_DEBIT_COLUMNS = ("debit", "withdrawal", "withdrawal amt", "withdrawal amount", "debit amount", "dr")
+CSV_CREDIT_COLUMNS = ("credit", "deposit", "deposit amt", "deposit amount", "credit amount", "cr")
+
+_init_lock = threading.Lock()
+_initialized = False
+
+
+# --- PARSING HELPERS ---
+
+def parse_date(text, month_first=False):
+    """'15/01/2024', '2024-01-15', '15 Jan 2024', "01/15'24" ... -> '2024-01-15' (None if unparseable)."""
+    text = str(text or "").strip().replace("'", "/")
+    if not re.search(r"[A-Za-z]", text):
+        text = text.split(" ")[0]   # drop a trailing time: '15/01/2024 10:32'
+    formats = MONTH_FIRST_FORMATS + DATE_FORMATS if month_first else DATE_FORMATS + MONTH_FIRST_FORMATS
+    for fmt in formats:
+        try:
+            return datetime.strptime(text, fmt).strftime("%Y-%m-%d")
+        except ValueError:
+            continue
+    return None
+
+
+def parse_amount(text):
+    """'₹1,234.50', '(12.00)', '12.00 DR', '-5' -> float (None if empty/unparseable)."""
+    raw = str(text or "").strip()
+    if not raw:
+        return None
+    upper = raw.upper()
+    negative = raw.startswith("(") and raw.endswith(")") or upper.endswith("DR") or "-" in raw
+    cleaned = re.sub(r"[^0-9.]", "", raw)
+    if not cleaned or cleaned == ".":
+        return None
+    try:
+        value = float(cleaned)
+    except ValueError:
+        return None
+    return -value if negative else value
+
+
+def normalize_description(text):
+    """Lowercase, punctuation and repeated spaces removed: the description part of the dedupe key."""
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", str(text or "").lower()).split())
+
+
+def merchant_words(description):
+    """Normalized description without reference numbers and bank boilerplate."""
+    words = normalize_description(description).split()
+    return [w for w in words if w not in BANK_NOISE and not any(ch.isdigit() for ch in w) and len(w) > 1]
+
+
+def load_merchant_rules():
+    """Built-in rules plus data/merchant_rules.json (user rules win)."""
+    rules = [{"match": m, "item": i, "category": c, "is_healthy": h} for m, i, c, h in DEFAULT_MERCHANT_RULES]
+    if os.path.exists(MERCHANT_RULES_FILE):
+        try:
+            with open(MERCHANT_RULES_FILE, encoding='utf-8') as f:
+                rules = json.load(f) + rules
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"⚠️ Could not read {MERCHANT_RULES_FILE}: {e}")
+    for rule in rules:
+        rule["match"] = normalize_description(rule["match"])
+    return rules
+
+
+def map_merchant(description, rules, default_category="General"):
+    """Returns (item, category, is_healthy or None) for a statement description."""
+    text = " " + " ".join(merchant_words(description)) + " "
+    for rule in rules:
+        if f" {rule['match']} " in text:
+            return rule["item"], rule.get("category") or default_category, rule.get("is_healthy")
+    words = text.split()
+    item = " ".join(words[:3]) if words else "unknown merchant"
+    return item, default_category, None
+
+
+# --- STREAMING READERS ---
+# Each yields {"date": "YYYY-MM-DD", "amount": spend (> 0) or refund/income (<= 0), "description": str}
+# or None for a line it could not understand. Files are read incrementally, never loaded whole.
+
+class _ProgressFile:
+    """Wraps a text file and counts the characters handed out (for progress reporting)."""
+
+    def __init__(self, f):
+        self.f = f
+        self.read_chars = 0
+
+    def __iter__(self):
+        for line in self.f:
+            self.read_chars += len(line)
+            yield line
+
+    def read(self, size):
+        chunk = self.f.read(size)
+        self.read_chars += len(chunk)
+        return chunk
+
+
+def _pick(header, names):
+    for i, col in enumerate(header):
+        if col in names:
+            return i
+    return None
+
+
+def iter_csv(f, sign="negative", month_first=False):
+    """
+    Bank CSV exports: finds the header row (skipping any preamble), then reads row by row.
+    Uses Debit/Credit columns when present, otherwise one Amount column where
+    sign="negative" means negative amounts are spending (sign="positive": the reverse).
+    """
+    reader = csv.reader(f)
+    header = None
+    for row in reader:
+        cells = [c.strip().lower() for c in row]
+        if _pick(cells, CSV_DATE_COLUMNS) is not None and _pick(cells, CSV_DESCRIPTION_COLUMNS) is not None:
+            header = cells
+            break
+    if header is None:
+        raise ValueError("No header row with a date and a description column found.")
+
+    i_date = _pick(header, CSV_DATE_COLUMNS)
+    i_desc = _pick(header, CSV_DESCRIPTION_COLUMNS)
+    i_amount = _pick(header, CSV_AMOUNT_COLUMNS)
+    i_debit = _pick(header, CSV_DEBIT_COLUMNS)
+    i_credit = _pick(header, CSV_CREDIT_COLUMNS)
+    if i_amount is None and i_debit is None:
+        raise ValueError("No amount or debit column found.")
+
+    for row in reader:
+        if not any(c.strip() for c in row):
+            continue
+        cell = lambda i: row[i] if i is not None and i < len(row) else ""  # noqa: E731
+        txn_date = parse_date(cell(i_date), month_first)
+        if i_debit is not None:
+            debit, credit = parse_amount(cell(i_debit)), parse_amount(cell(i_credit))
+            amount = abs(debit) if debit else (-abs(credit) if credit else None)
+        else:
+            amount = parse_amount(cell(i_amount))
+            if amount is not None and sign == "negative":
+                amount = -amount
+        if txn_date is None or amount is None:
+            yield None
+            continue
+        yield {"date": txn_date, "amount": amount, "description": cell(i_desc).strip()}
+
+
+_OFX_TAG = re.compile(r"<(/?)([A-Za-z0-9.]+)>([^<]*)")
+
+
+def iter_ofx(f, sign="negative", month_first=False):
+    """OFX/QFX (SGML or XML): scans <STMTTRN> blocks chunk by chunk. TRNAMT < 0 is spending."""
+    buffer = ""
+    txn = None
+    while True:
+        chunk = f.read(OFX_CHUNK_SIZE)
+        buffer += chunk
+        if chunk:
+            # Keep the last (maybe incomplete) tag for the next round
+            cut = buffer.rfind("<")
+            if cut <= 0:
+                continue
+            text, buffer = buffer[:cut], buffer[cut:]
+        else:
+            text, buffer = buffer, ""
+
+        for closing, tag, value in _OFX_TAG.findall(text):
+            tag, value = tag.upper(), value.strip()
+            if tag == "STMTTRN":
+                if not closing:
+                    txn = {}
+                elif txn is not None:
+                    amount = parse_amount(txn.get("TRNAMT"))
+                    txn_date = parse_date(txn.get("DTPOSTED", "")[:8])
+                    if amount is None or txn_date is None:
+                        yield None
+                    else:
+                        description = " ".join(v for v in (txn.get("NAME"), txn.get("MEMO")) if v)
+                        yield {"date": txn_date, "amount": -amount, "description": description}
+                    txn = None
+            elif txn is not None and not closing and value:
+                txn[tag] = value
+
+        if not chunk:
+            return
+
+
+def iter_qif(f, sign="negative", month_first=True):
+    """QIF: one field per line (D date, T amount, P payee, M memo), records end with '^'. Dates are MM/DD."""
+    record = {}
+    for line in f:
+        line = line.rstrip("\r\n")
+        if not line or line.startswith("!"):
+            continue
+        code, value = line[0], line[1:].strip()
+        if code == "D":
+            value = value.replace(" ", "")   # Quicken pads dates: 'D1/ 5'26'
+        if code != "^":
+            record.setdefault(code, value)
+            continue
+
+        amount = parse_amount(record.get("T") or record.get("U"))
+        txn_date = parse_date(record.get("D"), month_first)
+        if amount is None or txn_date is None:
+            yield None
+        else:
+            description = " ".join(v for v in (record.get("P"), record.get("M")) if v)
+            yield {"date": txn_date, "amount": -amount, "description": description}
+        record = {}
+
+
+READERS = {"csv": iter_csv, "ofx": iter_ofx, "qif": iter_qif}
+
+
+# --- DUPLICATE INDEX ---
+# SHA-256 of (date, amount, normalized description, occurrence) for every imported row.
+# The occurrence number keeps two genuinely identical purchases on the same day apart,
+# while re-importing the same (or an overlapping) statement maps to the same keys.
+
+def _connect():
+    conn = sqlite3.connect(INDEX_FILE, timeout=10)
+    conn.execute("PRAGMA journal_mode=WAL")
+    return conn
+
+
+def initialize_index():
+    """Creates the import index if it does not exist."""
+    global _initialized
+    with _init_lock:
+        if _initialized:
+            return
+        os.makedirs(os.path.dirname(INDEX_FILE), exist_ok=True)
+        conn = _connect()
+        try:
+            conn.execute('''
+            CREATE TABLE IF NOT EXISTS imported (
+                hash TEXT PRIMARY KEY,
+                date TEXT NOT NULL,
+                amount REAL NOT NULL,
+                description TEXT NOT NULL,
+                source TEXT,
+                imported_at REAL NOT NULL
+            ) WITHOUT ROWID
+            ''')
+            conn.commit()
+            _initialized = True
+        finally:
+            conn.close()
+
+
+def transaction_hash(txn_date, amount, description, occurrence=0):
+    key = f"{txn_date}|{amount:.2f}|{normalize_description(description)}|{occurrence}"
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+def _already_imported(conn, hashes):
+    found = set()
+    hashes = list(hashes)
+    for i in range(0, len(hashes), 900):   # stay under SQLite's variable limit
+        part = hashes[i:i + 900]
+        rows = conn.execute(f"SELECT hash FROM imported WHERE hash IN ({', '.join('?' * len(part))})", part)
+        found.update(r[0] for r in rows)
+    return found
+
+
+# --- IMPORT ---
+
+def detect_format(path):
+    ext = os.path.splitext(path)[1].lower().lstrip(".")
+    return {"qfx": "ofx", "txt": "csv"}.get(ext, ext)
+
+
+def import_statement(path, fmt=None, category="General", sign="negative", month_first=None,
+                     dry_run=False, progress=None):
+    """
+    Streams a bank/card statement into 'expenses' in batches of BATCH_SIZE.
+    Only spending is imported (credits/refunds are skipped), already-imported
+    transactions are skipped via the local hash index, and rows whose item health
+    is unknown are held back and reported (learn them, then import the file again).
+    'progress' is called after every batch with the running stats dict.
+    month_first=None reads QIF dates as MM/DD (Quicken's order) and CSV dates as DD/MM.
+    """
+    fmt = (fmt or detect_format(path)).lower()
+    if fmt not in READERS:
+        return f"❌ Unknown format '{fmt}'. Use one of: {', '.join(FORMATS)}"
+    if month_first is None:
+        month_first = fmt == "qif"
+    if not os.path.exists(path):
+        return f"❌ File not found: {path}"
+
+    rules = load_merchant_rules()
+    initialize_index()
+    conn = _connect()
+    stats = {"read": 0, "imported": 0, "duplicates": 0, "credits": 0, "unreadable": 0,
+             "needs_health": 0, "amount": 0.0, "percent": 0.0}
+    unknown_items = Counter()
+    occurrences = OrderedDict()   # date -> Counter of (amount, description), last OPEN_DATES dates only
+    size = max(os.path.getsize(path), 1)
+    source = os.path.basename(path)
+
+    def flush(batch):
+        if not batch:
+            return
+        done = _already_imported(conn, [h for h, _ in batch])
+        fresh = [(h, row) for h, row in batch if h not in done]
+        stats["duplicates"] += len(batch) - len(fresh)
+
+        # Health: merchant rules first, then the knowledge base in one lookup
+        lookup = [row['item'] for _, row in fresh if row['is_healthy'] is None]
+        known = finance_manager.check_items_health(lookup) if lookup else {}
+        rows, hashes = [], []
+        for h, row in fresh:
+            if row['is_healthy'] is None:
+                row['is_healthy'] = known.get(finance_manager.normalize_item(row['item']))
+            if row['is_healthy'] is None:
+                unknown_items[row['item']] += 1
+                stats["needs_health"] += 1
+                continue
+            rows.append({k: row[k] for k in ("date", "item", "amount", "category", "is_healthy")})
+            hashes.append((h, row['date'], row['amount'], row['description'], source, time.time()))
+
+        if rows and not dry_run:
+            write_journal.insert("expenses", rows)
+            # Marked only after the insert went through; a crash in between can re-import a batch
+            with conn:
+                conn.executemany("INSERT OR IGNORE INTO imported VALUES (?, ?, ?, ?, ?, ?)", hashes)
+            finance_manager.update_rollups(rows)
+        stats["imported"] += len(rows)
+        stats["amount"] += sum(r['amount'] for r in rows)
+
+    try:
+        with open(path, encoding='utf-8-sig', errors='replace', newline='') as raw:
+            f = _ProgressFile(raw)
+            batch = []
+            for txn in READERS[fmt](f, sign=sign, month_first=month_first):
+                stats["read"] += 1
+                if txn is None:
+                    stats["unreadable"] += 1
+                    continue
+                if txn["amount"] <= 0:
+                    stats["credits"] += 1
+                    continue
+
+                amount = round(txn["amount"], 2)
+                # Counters are per date, so memory stays bounded on long statements
+                seen = occurrences.get(txn["date"])
+                if seen is None:
+                    seen = occurrences[txn["date"]] = Counter()
+                    if len(occurrences) > OPEN_DATES:
+                        occurrences.popitem(last=False)
+                occurrences.move_to_end(txn["date"])
+                key = (amount, normalize_description(txn["description"]))
+                h = transaction_hash(txn["date"], amount, txn["description"], seen[key])
+                seen[key] += 1
+
+                item, item_category, is_healthy = map_merchant(txn["description"], rules, category)
+                batch.append((h, {"date": txn["date"], "item": item, "amount": amount, "category": item_category,
+                                  "is_healthy": is_healthy, "description": txn["description"]}))
+
+                if len(batch) >= BATCH_SIZE:
+                    flush(batch)
+                    batch = []
+                    stats["percent"] = min(100.0, f.read_chars / size * 100)
+                    if progress:
+                        progress(dict(stats))
+            flush(batch)
+            stats["percent"] = 100.0
+            if progress:
+                progress(dict(stats))
+    except Exception as e:
+        return f"❌ Import stopped after {stats['imported']} rows: {str(e)}"
+    finally:
+        conn.close()
+
+    verb = "Would import" if dry_run else "Imported"
+    lines = [f"✅ {verb} {stats['imported']} expense(s) (₹{stats['amount']:,.2f}) from {source}.",
+             f"   {stats['duplicates']} already imported, {stats['credits']} credits/refunds skipped, "
+             f"{stats['unreadable']} unreadable row(s)."]
+    if unknown_items:
+        top = ", ".join(f"'{item}' ({n})" for item, n in unknown_items.most_common(10))
+        lines.append(f"❓ {stats['needs_health']} row(s) held back, health unknown for: {top}")
+        lines.append("   Teach these with learn_food_health (or data/merchant_rules.json), then import again.")
+    return "\n".join(lines)
@@ -0,0 +1,211 @@
+import atexit
+import json
+import os
+import sqlite3
+import threading
+import time
+from modules.database import get_client, bump_table_version
+
+# --- CONFIGURATION ---
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
+JOURNAL_FILE = os.path.join(PROJECT_ROOT, 'data', 'journal.db')
+
+# Set PYLIFE_OFFLINE_WRITES=1 in .env to write locally first and sync in the background
+OFFLINE_WRITES = os.getenv("PYLIFE_OFFLINE_WRITES", "0") == "1"
+FLUSH_INTERVAL = float(os.getenv("PYLIFE_FLUSH_INTERVAL", "2"))
+FLUSH_BATCH_SIZE = 500
+MAX_BACKOFF = 300
+
+_initialized = False
+_flush_lock = threading.Lock()
+_flusher = None
+_flusher_lock = threading.Lock()
+
+
+def _connect():
+    """Opens the journal database (one short-lived connection per call, thread-safe)."""
+    conn = sqlite3.connect(JOURNAL_FILE, timeout=10)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+def initialize_journal():
+    """Creates the journal table if it does not exist."""
+    global _initialized
+    if _initialized:
+        return
+
+    os.makedirs(os.path.dirname(JOURNAL_FILE), exist_ok=True)
+    conn = _connect()
+    try:
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS journal (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_name TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            synced INTEGER NOT NULL DEFAULT 0,
+            remote_id INTEGER,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at REAL NOT NULL DEFAULT 0,
+            last_error TEXT
+        )
+        ''')
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_journal_pending ON journal (synced, next_attempt_at, id)")
+        conn.commit()
+        _initialized = True
+    finally:
+        conn.close()
+
+
+def enqueue(table, rows):
+    """Appends rows to the local journal. Returns their local journal ids."""
+    initialize_journal()
+    now = time.time()
+    conn = _connect()
+    try:
+        ids = []
+        for row in rows:
+            cur = conn.execute(
+                "INSERT INTO journal (table_name, payload, created_at) VALUES (?, ?, ?)",
+                (table, json.dumps(row), now)
+            )
+            ids.append(cur.lastrowid)
+        conn.commit()
+        return ids
+    finally:
+        conn.close()
+
+
+def insert(table, rows):
+    """
+    Single entry point for append-only writes (expenses, debts, workouts, nutrition_logs).
+    Offline mode: journal locally and return immediately; the flusher syncs later.
+    Online mode: insert straight into Supabase (one bulk request).
+    Returns the inserted rows.
+    """
+    if isinstance(rows, dict):
+        rows = [rows]
+
+    if not OFFLINE_WRITES:
+        data = get_client().table(table).insert(rows).execute().data
+        bump_table_version(table)
+        return data
+
+    local_ids = enqueue(table, rows)
+    bump_table_version(table)
+    start_flusher()
+    return [dict(row, local_id=local_id) for row, local_id in zip(rows, local_ids)]
+
+
+def flush():
+    """
+    Pushes pending rows to Supabase in per-table batches.
+    Failed batches are retried with exponential backoff.
+    Delivery is at-least-once: a crash between the cloud insert and the local
+    bookkeeping can resend a batch. Returns the number of rows synced.
+    """
+    if not os.path.exists(JOURNAL_FILE):
+        return 0
+
+    with _flush_lock:
+        synced = 0
+        conn = _connect()
+        try:
+            while True:
+                pending = conn.execute(
+                    "SELECT id, table_name, payload, attempts FROM journal "
+                    "WHERE synced = 0 AND next_attempt_at <= ? ORDER BY id LIMIT ?",
+                    (time.time(), FLUSH_BATCH_SIZE)
+                ).fetchall()
+                if not pending:
+                    break
+
+                # Group by table, keeping journal order inside each group
+                batches = {}
+                for row in pending:
+                    batches.setdefault(row['table_name'], []).append(row)
+
+                failed = False
+                for table, batch in batches.items():
+                    payloads = [json.loads(r['payload']) for r in batch]
+                    try:
+                        response = get_client().table(table).insert(payloads).execute()
+                    except Exception as e:
+                        failed = True
+                        for r in batch:
+                            delay = min(MAX_BACKOFF, 2 ** r['attempts'])
+                            conn.execute(
+                                "UPDATE journal SET attempts = attempts + 1, next_attempt_at = ?, last_error = ? WHERE id = ?",
+                                (time.time() + delay, str(e), r['id'])
+                            )
+                        conn.commit()
+                        continue
+
+                    # Reconcile local journal ids with the ids Supabase assigned
+                    remote_rows = response.data or []
+                    for i, r in enumerate(batch):
+                        remote_id = remote_rows[i].get('id') if i < len(remote_rows) else None
+                        conn.execute(
+                            "UPDATE journal SET synced = 1, remote_id = ?, last_error = NULL WHERE id = ?",
+                            (remote_id, r['id'])
+                        )
+                    conn.commit()
+                    bump_table_version(table)
+                    synced += len(batch)
+
+                if failed:
+                    break
+        finally:
+            conn.close()
+        return synced
+
+
+def get_remote_id(local_id):
+    """Returns the Supabase id assigned to a journaled row (None until synced)."""
+    if not os.path.exists(JOURNAL_FILE):
+        return None
+    conn = _connect()
+    try:
+        row = conn.execute("SELECT remote_id FROM journal WHERE id = ?", (local_id,)).fetchone()
+        return row['remote_id'] if row else None
+    finally:
+        conn.close()
+
+
+def pending_count(table=None):
+    """Number of journaled rows (optionally for one table) not yet in Supabase."""
+    if not os.path.exists(JOURNAL_FILE):
+        return 0
+    conn = _connect()
+    try:
+        if table:
+            return conn.execute(
+                "SELECT COUNT(*) FROM journal WHERE synced = 0 AND table_name = ?", (table,)
+            ).fetchone()[0]
+        return conn.execute("SELECT COUNT(*) FROM journal WHERE synced = 0").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def _flush_loop():
+    while True:
+        time.sleep(FLUSH_INTERVAL)
+        try:
+            flush()
+        except Exception as e:
+            print(f"⚠️ Journal sync failed: {e}")
+
+
+def start_flusher():
+    """Starts the background sync thread once per process."""
+    global _flusher
+    with _flusher_lock:
+        if _flusher is None or not _flusher.is_alive():
+            _flusher = threading.Thread(target=_flush_loop, name="journal-flusher", daemon=True)
+            _flusher.start()
+            # Best-effort final sync so short-lived CLI runs don't leave rows behind
+            atexit.register(flush)
@@ -1,6 +1,12 @@
 import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
 import psycopg2
-from modules.database import get_client
+from modules.database import get_client, get_table_version
+from modules import database, snapshot, social_manager, sqlite_backend
 
 # --- 1. THE BRAIN (Schema for the AI) ---
 DB_SCHEMA = """
@@ -44,60 +50,333 @@ CRITICAL RULES:
      AND d.status = 'Active';
 """
 
+# Appended when PYLIFE_BACKEND=sqlite (ILIKE is still accepted, see sqlite_backend.run_sql)
+SQLITE_DIALECT_NOTE = """
+5. DIALECT: The database is SQLite, not PostgreSQL.
+   - Dates are 'YYYY-MM-DD' text: use strftime('%Y-%m', date) instead of EXTRACT/DATE_TRUNC.
+   - Booleans are stored as 1/0.
+"""
+
+
+# --- 2. CONNECTION POOL (Direct DB Connection) ---
+# Created lazily from DB_CONNECTION_STRING on the first query and shared by the process.
+POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "5"))
+POOL_WAIT_TIMEOUT = 30          # seconds to wait for a free connection
+POOL_HEALTH_CHECK_AFTER = 60    # idle seconds before a connection is pinged on checkout
+STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "15000"))
+
+_idle_connections = []          # [(conn, last_used_at), ...]
+_pool_slots = threading.BoundedSemaphore(POOL_MAX_SIZE)
+_pool_lock = threading.Lock()
+_pool_stats = {"created": 0, "checked_out": 0, "waits": 0, "discarded": 0}
+
+
+def _create_connection(db_url):
+    """Opens a new connection with our per-session settings."""
+    conn = psycopg2.connect(
+        db_url,
+        application_name="pylife-analyst",
+        options=f"-c statement_timeout={STATEMENT_TIMEOUT_MS}"
+    )
+    with _pool_lock:
+        _pool_stats["created"] += 1
+    return conn
+
+
+def _is_healthy(conn, last_used_at):
+    """Cheap liveness check; only pings connections that sat idle for a while."""
+    if conn.closed:
+        return False
+    if time.monotonic() - last_used_at < POOL_HEALTH_CHECK_AFTER:
+        return True
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT 1")
+        conn.rollback()
+        return True
+    except Exception:
+        return False
+
+
+@contextmanager
+def pooled_connection(db_url):
+    """Checks a warm connection out of the pool (creating one if needed) and returns it afterwards."""
+    if not _pool_slots.acquire(blocking=False):
+        with _pool_lock:
+            _pool_stats["waits"] += 1
+        if not _pool_slots.acquire(timeout=POOL_WAIT_TIMEOUT):
+            raise TimeoutError("No free database connection in the pool.")
 
-def run_raw_sql(query):
-    """Executes raw SQL using psycopg2 (Direct DB Connection)."""
     conn = None
+    broken = False
+    try:
+        while conn is None:
+            with _pool_lock:
+                candidate = _idle_connections.pop() if _idle_connections else None
+            if candidate is None:
+                conn = _create_connection(db_url)
+            elif _is_healthy(*candidate):
+                conn = candidate[0]
+            else:
+                candidate[0].close()
+                with _pool_lock:
+                    _pool_stats["discarded"] += 1
+
+        with _pool_lock:
+            _pool_stats["checked_out"] += 1
+        yield conn
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        # Lost connection - don't put it back
+        broken = True
+        raise
+    finally:
+        if conn is not None:
+            try:
+                # Never hand out a connection that is mid-transaction
+                if not conn.closed:
+                    conn.rollback()
+            except Exception:
+                broken = True
+
+            if broken or conn.closed:
+                conn.close()
+                with _pool_lock:
+                    _pool_stats["discarded"] += 1
+            else:
+                with _pool_lock:
+                    _idle_connections.append((conn, time.monotonic()))
+        _pool_slots.release()
+
+
+def get_pool_stats():
+    """Returns pool counters (created, checked_out, waits, discarded, idle, max_size)."""
+    with _pool_lock:
+        stats = dict(_pool_stats)
+        stats["idle"] = len(_idle_connections)
+    stats["max_size"] = POOL_MAX_SIZE
+    return stats
+
+
+def close_pool():
+    """Closes every idle connection (e.g. on shutdown)."""
+    with _pool_lock:
+        while _idle_connections:
+            conn, _ = _idle_connections.pop()
+            conn.close()
+
+
+def run_raw_sql(query):
+    """Executes raw SQL on a pooled psycopg2 connection (Direct DB Connection)."""
+    if database.BACKEND == "sqlite":
+        try:
+            return sqlite_backend.run_sql(query)
+        except Exception as e:
+            return None, f"SQL Error: {str(e)}"
+
     try:
         # Connect using the string from .env
         db_url = os.getenv("DB_CONNECTION_STRING")
         if not db_url:
             return None, "❌ Error: DB_CONNECTION_STRING is missing from .env file."
 
-        conn = psycopg2.connect(db_url)
-        cursor = conn.cursor()
+        with pooled_connection(db_url) as conn:
+            cursor = conn.cursor()
+            cursor.execute(query)
 
-        cursor.execute(query)
+            # If query is a SELECT, fetch data.
+            if query.strip().upper().startswith("SELECT"):
+                columns = [desc[0] for desc in cursor.description]
+                results = cursor.fetchall()
+                return columns, results
+            else:
+                conn.commit()
+                return [], "Action completed."
 
-        # If query is a SELECT, fetch data.
-        if query.strip().upper().startswith("SELECT"):
-            columns = [desc[0] for desc in cursor.description]
-            results = cursor.fetchall()
-            return columns, results
-        else:
-            conn.commit()
-            return [], "Action completed."
+    except Exception as e:
+        return None, f"SQL Error: {str(e)}"
 
+
+def run_local_sql(query):
+    """
+    Executes a read-only query on the local Parquet snapshot with DuckDB.
+    The tables it reads are synced first (only rows changed since the last sync).
+    """
+    try:
+        return snapshot.query(query)
     except Exception as e:
         return None, f"SQL Error: {str(e)}"
-    finally:
-        if conn: conn.close()
 
 
-def ask_database(user_question, ai_client_func):
+# --- 3. QUERY CACHES ---
+# Level 1: normalized question (friend names swapped for placeholders) -> validated SQL template.
+# Level 2: exact SQL -> result rows, dropped when any table it reads is written.
+SQL_TEMPLATE_CACHE_SIZE = 256
+RESULT_CACHE_SIZE = 256
+RESULT_CACHE_TTL = 300   # seconds; also covers writes made by other processes
+
+KNOWN_TABLES = ("friends", "expenses", "item_health", "debts", "payments", "workouts", "nutrition_logs")
+
+_sql_templates = OrderedDict()
+_results = OrderedDict()
+_cache_lock = threading.Lock()
+_cache_stats = {"template_hits": 0, "result_hits": 0, "misses": 0}
+
+
+def normalize_question(question):
+    """Lowercases, drops punctuation and collapses whitespace."""
+    text = re.sub(r"[^\w\s']", " ", str(question).lower())
+    return " ".join(text.split())
+
+
+def _parameterize(question):
+    """
+    Replaces known friend names with placeholders. Entities are the stored display
+    names, since friends.name comparisons in the generated SQL are case-sensitive.
+    "how much does pratham owe me" -> ("how much does __PERSON_0__ owe me", ["Pratham"])
     """
-    1. Sends Schema + Question to AI.
-    2. Runs generated SQL.
+    names = [n for n in social_manager.list_friend_names()
+             if n and social_manager.normalize_name(n) not in social_manager.SELF_ALIASES]
+
+    entities = []
+    # Longest names first so "pratham s" wins over "pratham"
+    for name in sorted(names, key=len, reverse=True):
+        pattern = r"\b" + re.escape(social_manager.normalize_name(name)) + r"\b"
+        if re.search(pattern, question):
+            question = re.sub(pattern, f"__PERSON_{len(entities)}__", question)
+            entities.append(name)
+    return question, entities
+
+
+def _make_template(sql_query, entities):
+    """Swaps entity names in generated SQL for placeholders (None if a name can't be found)."""
+    template = sql_query
+    for i, name in enumerate(entities):
+        pattern = re.compile(r"\b" + re.escape(name) + r"\b", re.IGNORECASE)
+        if not pattern.search(template):
+            return None
+        template = pattern.sub(f"__PERSON_{i}__", template)
+    return template
+
+
+def _fill_template(template, entities):
+    sql_query = template
+    for i, name in enumerate(entities):
+        sql_query = sql_query.replace(f"__PERSON_{i}__", name.replace("'", "''"))
+    return sql_query
+
+
+def _lru_put(cache, key, value, max_size):
+    cache[key] = value
+    cache.move_to_end(key)
+    while len(cache) > max_size:
+        cache.popitem(last=False)
+
+
+def _tables_in(sql_query):
+    lowered = sql_query.lower()
+    return tuple(t for t in KNOWN_TABLES if re.search(r"\b" + t + r"\b", lowered))
+
+
+def _cached_result(sql_query):
+    """Returns (columns, data) if the cached result is still fresh, else None."""
+    with _cache_lock:
+        entry = _results.get(sql_query)
+        if entry is None:
+            return None
+        columns, data, versions, cached_at = entry
+        stale = time.monotonic() - cached_at > RESULT_CACHE_TTL
+        changed = any(get_table_version(t) != v for t, v in versions.items())
+        if stale or changed:
+            del _results[sql_query]
+            return None
+        _results.move_to_end(sql_query)
+        return columns, data
+
+
+def _store_result(sql_query, columns, data):
+    versions = {t: get_table_version(t) for t in _tables_in(sql_query)}
+    with _cache_lock:
+        _lru_put(_results, sql_query, (columns, data, versions, time.monotonic()), RESULT_CACHE_SIZE)
+
+
+def get_cache_stats():
+    """Returns hit/miss counters and current sizes of both cache levels."""
+    with _cache_lock:
+        stats = dict(_cache_stats)
+        stats["templates"] = len(_sql_templates)
+        stats["results"] = len(_results)
+    return stats
+
+
+def clear_query_cache():
+    with _cache_lock:
+        _sql_templates.clear()
+        _results.clear()
+
+
+def ask_database(user_question, ai_client_func, local=False):
+    """
+    1. Reuses a cached SQL template for this kind of question, or sends Schema + Question to AI.
+    2. Runs the SQL (or serves a fresh cached result).
+       local=True runs it on the DuckDB snapshot (modules/snapshot.py) instead of the database.
     3. Returns data.
     """
     print(f"🤔 Analyzing: {user_question}")
 
-    # Step 1: Get SQL from AI
-    prompt = f"{DB_SCHEMA}\n\nUser Question: {user_question}\nSQL Query:"
+    question_key, entities = _parameterize(normalize_question(user_question))
+
+    # Step 1: Get SQL - from the template cache, else from the AI
+    with _cache_lock:
+        template = _sql_templates.get(question_key)
+        if template is not None:
+            _sql_templates.move_to_end(question_key)
+
+    if template is not None:
+        sql_query = _fill_template(template, entities)
+        with _cache_lock:
+            _cache_stats["template_hits"] += 1
+        print(f"⚡ Cached SQL: {sql_query}")
+    else:
+        schema = DB_SCHEMA + SQLITE_DIALECT_NOTE if database.BACKEND == "sqlite" else DB_SCHEMA
+        prompt = f"{schema}\n\nUser Question: {user_question}\nSQL Query:"
 
-    # This calls your AI function
-    sql_query = ai_client_func(prompt).strip()
+        # This calls your AI function
+        sql_query = ai_client_func(prompt).strip()
 
-    # Clean up markdown if the AI adds it
-    sql_query = sql_query.replace("```sql", "").replace("```", "").strip()
-    print(f"🤖 Generated SQL: {sql_query}")
+        # Clean up markdown if the AI adds it
+        sql_query = sql_query.replace("```sql", "").replace("```", "").strip()
+        with _cache_lock:
+            _cache_stats["misses"] += 1
+        print(f"🤖 Generated SQL: {sql_query}")
 
     # Step 2: Run SQL using psycopg2 (Path B)
     # We use this instead of supabase-py to avoid the raw SQL limitation
-    columns, data = run_raw_sql(sql_query)
+    is_select = sql_query.strip().upper().startswith("SELECT")
+    if local and not is_select:
+        return "❌ Execution Failed: the local snapshot is read-only."
+    # Local and cloud results can differ (snapshot lag), so they are cached separately
+    cache_key = f"-- local\n{sql_query}" if local else sql_query
+    cached = _cached_result(cache_key) if is_select else None
+
+    if cached is not None:
+        columns, data = cached
+        with _cache_lock:
+            _cache_stats["result_hits"] += 1
+    else:
+        columns, data = run_local_sql(sql_query) if local else run_raw_sql(sql_query)
+
+        if isinstance(data, str) and ("Error" in data or "limitation" in data):
+            return f"❌ Execution Failed: {data}"
+
+        if is_select:
+            _store_result(cache_key, columns, data)
 
-    if isinstance(data, str) and ("Error" in data or "limitation" in data):
-        return f"❌ Execution Failed: {data}"
+            # The SQL ran fine, so it is safe to reuse for the same kind of question
+            if template is None:
+                new_template = _make_template(sql_query, entities)
+                if new_template is not None:
+                    with _cache_lock:
+                        _lru_put(_sql_templates, question_key, new_template, SQL_TEMPLATE_CACHE_SIZE)
 
     if not data:
         return "📭 Database returned no results."
@@ -107,4 +386,4 @@ def ask_database(user_question, ai_client_func):
     for row in data:
         result_str += f"- {row}\n"
 
-    return result_str
\ No newline at end of file
+    return result_str
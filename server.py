@@ -1,10 +1,34 @@
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
 from mcp.server.fastmcp import FastMCP
-from modules import finance_manager, social_manager
+from modules import finance_manager, fitness_series, instrumentation, rollups, social_manager, write_journal
 from modules.database import get_client
 
 # Initialize the MCP Server
 mcp = FastMCP("Finance-Tracker")
 
+# supabase-py is blocking, so every tool runs on a bounded worker pool.
+# Independent tool calls overlap instead of waiting behind a slow RPC.
+TOOL_WORKERS = int(os.getenv("PYLIFE_TOOL_WORKERS", "8"))
+_tool_pool = ThreadPoolExecutor(max_workers=TOOL_WORKERS, thread_name_prefix="mcp-tool")
+
+
+def offload(func):
+    """
+    Turns a blocking tool function into an async handler that runs on the worker pool.
+    Each call is also timed and its database round trips counted (see server_stats).
+    """
+    func = instrumentation.instrument_tool(func)
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_tool_pool, functools.partial(func, *args, **kwargs))
+    return wrapper
+
 
 # ==============================================================================
 # 📝 SECTION 1: DATA ENTRY TOOLS (WRITE)
@@ -12,6 +36,7 @@ mcp = FastMCP("Finance-Tracker")
 
 # --- TOOL 1: Log Personal Expense ---
 @mcp.tool()
+@offload
 def log_personal_expense(item: str, amount: float, category: str = "Food", is_healthy: bool = None) -> str:
     """
     Logs a personal expense.
@@ -21,17 +46,49 @@ def log_personal_expense(item: str, amount: float, category: str = "Food", is_he
     result = finance_manager.log_expense(item, amount, category, is_healthy)
 
     if result.get("status") == "NEEDS_CLARIFICATION":
-        return (
+        message = (
             f"STOP: I cannot log '{item}' yet because I don't know if it is healthy. "
             f"Please ask the user: 'Is {item} considered healthy or unhealthy?' "
             f"Once they answer, use the 'learn_food_health' tool."
         )
+        if result.get("suggestions"):
+            known = ", ".join(f"'{name}' ({'Healthy' if healthy else 'Unhealthy'})"
+                              for name, healthy in result["suggestions"])
+            message += f" Similar known items: {known} - if the user meant one of these, log that name instead."
+        return message
+
+    return result["message"]
+
+
+# --- TOOL 1b: Log Many Expenses ---
+@mcp.tool()
+@offload
+def log_expenses_batch(items: list[dict], category: str = "Food") -> str:
+    """
+    Logs several personal expenses at once (a receipt, a whole day).
+
+    Args:
+        items: [{"item": "Burger", "amount": 120}, {"item": "Salad", "amount": 90, "is_healthy": true}]
+               Each entry may also set "category". Leave out "is_healthy" if unknown.
+        category: Default category for entries that don't set one.
+    """
+    result = finance_manager.log_expenses_batch(items, category)
+
+    if result.get("status") == "NEEDS_CLARIFICATION":
+        names = ", ".join(f"'{u['item']}'" for u in result["unknown"])
+        return (
+            f"{result['message']}.\n"
+            f"STOP: I could not log {names} because I don't know if they are healthy. "
+            f"Ask the user about ALL of them in one question, use 'learn_food_health' for each answer, "
+            f"then call 'log_expenses_batch' again with only those items."
+        )
 
     return result["message"]
 
 
 # --- TOOL 2: Learn Health Status ---
 @mcp.tool()
+@offload
 def learn_food_health(item: str, is_healthy: bool) -> str:
     """
     Teaches the system if a specific food item is healthy (True) or unhealthy (False).
@@ -44,6 +101,7 @@ def learn_food_health(item: str, is_healthy: bool) -> str:
 
 # --- TOOL 3: Add Friend ---
 @mcp.tool()
+@offload
 def add_friend(name: str, phone: str = None) -> str:
     """Registers a new friend for tracking shared expenses/debts."""
     return social_manager.add_friend(name, phone)
@@ -51,6 +109,7 @@ def add_friend(name: str, phone: str = None) -> str:
 
 # --- TOOL 4: Log Debt ---
 @mcp.tool()
+@offload
 def log_debt(borrower: str, lender: str, amount: float, description: str = "Loan") -> str:
     """
     Logs that one person owes another money.
@@ -65,6 +124,7 @@ def log_debt(borrower: str, lender: str, amount: float, description: str = "Loan
 
 # --- TOOL 5: Record Payment ---
 @mcp.tool()
+@offload
 def record_payment(payer: str, receiver: str, amount: float) -> str:
     """Records a payment (payback) and automatically settles the oldest debts."""
     result = social_manager.record_payment(payer, receiver, amount)
@@ -73,21 +133,51 @@ def record_payment(payer: str, receiver: str, amount: float) -> str:
     return str(result)
 
 
+# --- TOOL 5b: Split a Bill ---
+@mcp.tool()
+@offload
+def split_expense(payer: str, total: float, participants: list[str], description: str = "Split Bill",
+                  weights: list[float] = None, category: str = "Food", is_healthy: bool = None) -> str:
+    """
+    Splits a shared bill in one step instead of one log_debt call per person.
+    - payer: who paid ('Me' if the user paid).
+    - participants: everyone who shared the bill, INCLUDING the payer if they ate too.
+    - weights: (Optional) one number per participant, e.g. [2, 1, 1] if the first person had double.
+    If the user paid, their own share is logged as an expense; pass is_healthy if known.
+    """
+    result = social_manager.split_expense(payer, total, participants, description, weights, category, is_healthy)
+    if result.startswith("NEEDS_CLARIFICATION"):
+        return (
+            f"STOP: I cannot split '{description}' yet because I don't know if it is healthy. "
+            f"Please ask the user: 'Is {description} considered healthy or unhealthy?' "
+            f"Then call 'split_expense' again with is_healthy set."
+        )
+    return result
+
+
 # ==============================================================================
 # 🧠 SECTION 2: SMART ANALYST TOOLS (READ / VIEW)
 # ==============================================================================
 
 # --- TOOL 6: Social Finance Manager (Unified) ---
 @mcp.tool()
+@offload
 def check_social_finances(query_type: str, person: str = None) -> str:
     """
-    The Master Tool for social finances. Can answer history OR balance questions.
+    The Master Tool for social finances. Can answer history, balance OR settle-up questions.
 
     Args:
         query_type: 'BALANCE' for questions like "Who owes me?", "How much does X owe?".
                     'HISTORY' for questions like "History with X", "What payments did X make?".
+                    'SETTLE' for "Who should pay whom to settle everything?".
         person: (Optional) Name of specific person to filter by.
     """
+    # Balances and settle-up plans come from the in-memory ledger
+    if query_type.upper() == "BALANCE":
+        return social_manager.balance_report(person)
+    if query_type.upper() == "SETTLE":
+        return social_manager.settle_up_plan()
+
     supabase = get_client()
 
     # RPC call to Supabase
@@ -118,13 +208,36 @@ def check_social_finances(query_type: str, person: str = None) -> str:
 
 # --- TOOL 7: Expense Analytics ---
 @mcp.tool()
-def analyze_spending(month: str = None) -> str:
+@offload
+def analyze_spending(month: str = None, end_month: str = None) -> str:
     """
     Analyzes personal spending by Category and Health.
 
     Args:
         month: Format 'YYYY-MM' (e.g. '2023-11'). Defaults to current month if omitted.
+        end_month: (Optional) 'YYYY-MM' to analyze every month from 'month' to 'end_month'.
     """
+    # Fast path: pre-aggregated monthly buckets (see modules/rollups.py)
+    if rollups.is_built():
+        start = month or date.today().strftime("%Y-%m")
+        buckets = rollups.get_buckets(start, end_month or start)
+        if not buckets:
+            return f"No spending data found for {month}."
+
+        totals = {}
+        for b in buckets:
+            key = (b['category'], b['health'])
+            totals[key] = totals.get(key, 0.0) + b['total']
+
+        period = f"{start} to {end_month}" if end_month else (month or 'Current Month')
+        lines = [f"--- Spending Analysis ({period}) ---"]
+        for (category, health), total in sorted(totals.items()):
+            lines.append(f"• {category} ({health}): ₹{round(total, 2)}")
+        return "\n".join(lines)
+
+    if end_month:
+        return "Multi-month analysis needs the spending rollups. Run 'python main.py rebuild_rollups' once."
+
     supabase = get_client()
 
     try:
@@ -150,21 +263,23 @@ def analyze_spending(month: str = None) -> str:
 # ==============================================================================
 
 @mcp.tool()
+@offload
 def log_workout(type: str = "General") -> str:
     """
     Logs that you went to the gym.
     Args:
         type: "Push", "Pull", "Legs", "Cardio", etc.
     """
-    supabase = get_client()
     try:
-        supabase.table("workouts").insert({"workout_type": type}).execute()
+        write_journal.insert("workouts", {"workout_type": type})
+        fitness_series.record_workout()
         return f"💪 Workout logged: {type}"
     except Exception as e:
         return f"Error: {e}"
 
 
 @mcp.tool()
+@offload
 def log_protein_intake(item_name: str, protein_g: int) -> str:
     """
     Logs food and its protein content.
@@ -177,21 +292,41 @@ def log_protein_intake(item_name: str, protein_g: int) -> str:
     User: "I ate a bowl of greek yogurt."
     AI Action: Call log_protein_intake("Greek Yogurt", 15)
     """
-    supabase = get_client()
     try:
         # We trust the AI's estimation and save it directly
-        supabase.table("nutrition_logs").insert({
+        write_journal.insert("nutrition_logs", {
             "item_name": item_name,
             "protein_g": protein_g
-        }).execute()
+        })
+        fitness_series.record_protein(protein_g)
         return f"🍗 Logged: {item_name} (~{protein_g}g protein)"
     except Exception as e:
         return f"Error: {e}"
 
 
 @mcp.tool()
+@offload
 def check_fitness_stats(days: int = 7) -> str:
-    """Checks gym attendance and total protein for the last X days."""
+    """Checks gym attendance and total protein for the last X days, plus 7/30/90/365-day totals and streaks."""
+    # Fast path: local daily buckets with prefix sums (see modules/fitness_series.py)
+    if fitness_series.is_built():
+        lines = [f"--- Fitness (Last {days} Days) ---"]
+        if days <= 31:
+            for d in fitness_series.get_daily(days):
+                gym = "✅ GYM" if d['sessions'] > 0 else "❌ Rest"
+                lines.append(f"{d['date']}: {gym} | {d['protein_g']:g}g Protein")
+
+        lines.append("--- Rolling Totals ---")
+        windows = sorted(set(fitness_series.WINDOWS) | {days})
+        stats = fitness_series.summary(windows)
+        for n in windows:
+            w = stats["windows"][n]
+            lines.append(f"{n} days: {w['gym_days']} gym days ({w['gym_rate'] * 100:.0f}%) | "
+                         f"{w['protein_g']:g}g protein (avg {w['avg_protein_g']:g}g/day)")
+        streaks = stats["streaks"]
+        lines.append(f"🔥 Streak: {streaks['current']} days (longest {streaks['longest']})")
+        return "\n".join(lines)
+
     supabase = get_client()
     try:
         res = supabase.rpc("get_fitness_stats", {"days_back": days}).execute()
@@ -206,5 +341,21 @@ def check_fitness_stats(days: int = 7) -> str:
         return f"Error: {e}"
 
 
+# ==============================================================================
+# 📈 SECTION 4: DIAGNOSTICS
+# ==============================================================================
+
+@mcp.tool()
+def server_stats() -> str:
+    """
+    Shows latency percentiles (p50/p95/p99), database round trips per call and
+    error rates for every tool and every database request since the server started.
+    Use this when the conversation feels slow.
+    """
+    return instrumentation.format_stats()
+
+
 if __name__ == "__main__":
+    # Warm the health knowledge base so known items are classified offline
+    finance_manager.preload_item_health()
     mcp.run()
\ No newline at end of file
@@ -0,0 +1,42 @@
+-- Pre-aggregated series for dashboard.py, so the browser never needs raw expense rows.
+-- Called as:
+--   supabase.rpc("get_daily_spend", {"start_date": "2024-01-01", "end_date": "2024-03-31"})
+--   supabase.rpc("get_category_spend", {"start_date": "2024-01-01", "end_date": "2024-03-31"})
+-- If they are not deployed the dashboard falls back to aggregating its cached rows.
+
+-- The range filters compare the bare column (only the parameters are date-typed),
+-- so they can use this index.
+CREATE INDEX IF NOT EXISTS idx_expenses_date ON expenses (date);
+
+-- One row per day with spending in the range
+CREATE OR REPLACE FUNCTION get_daily_spend(start_date date, end_date date)
+RETURNS TABLE (day date, total_spent numeric, healthy_spent numeric, item_count bigint, healthy_count bigint)
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT e.date::date AS day,
+           SUM(e.amount)::numeric,
+           COALESCE(SUM(e.amount) FILTER (WHERE e.is_healthy), 0)::numeric,
+           COUNT(*),
+           COUNT(*) FILTER (WHERE e.is_healthy)
+    FROM expenses e
+    WHERE e.date >= start_date AND e.date < end_date + 1
+    GROUP BY 1
+    ORDER BY 1;
+$$;
+
+-- One row per (category, health status) in the range
+CREATE OR REPLACE FUNCTION get_category_spend(start_date date, end_date date)
+RETURNS TABLE (category text, health_status text, total_spent numeric, item_count bigint)
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT COALESCE(e.category, 'General'),
+           CASE WHEN e.is_healthy THEN 'Healthy' ELSE 'Unhealthy' END,
+           SUM(e.amount)::numeric,
+           COUNT(*)
+    FROM expenses e
+    WHERE e.date >= start_date AND e.date < end_date + 1
+    GROUP BY 1, 2
+    ORDER BY 1, 2;
+$$;
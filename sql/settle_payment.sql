@@ -0,0 +1,22 @@
+-- Applies a FIFO payback allocation in one transaction.
+-- Called by modules/social_manager.record_payment:
+--   supabase.rpc("settle_payment", {"payment_rows": [...], "settled_ids": [...]})
+-- payment_rows: [{"date": "YYYY-MM-DD", "debt_id": 1, "payer_id": 2, "amount": 50.0}, ...]
+-- settled_ids:  ids of debts that are fully paid after this payment.
+
+CREATE OR REPLACE FUNCTION settle_payment(payment_rows jsonb, settled_ids bigint[])
+RETURNS void
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    INSERT INTO payments (date, debt_id, payer_id, amount)
+    SELECT (p->>'date')::date,
+           (p->>'debt_id')::bigint,
+           (p->>'payer_id')::bigint,
+           (p->>'amount')::numeric
+    FROM jsonb_array_elements(payment_rows) AS p;
+
+    UPDATE debts SET status = 'Settled'
+    WHERE id = ANY(settled_ids);
+END;
+$$;
@@ -0,0 +1,46 @@
+import pytest
+from modules import database, social_manager, sqlite_backend
+from output_modules import analysis
+
+OWED_SQL = ("SELECT SUM(d.amount) FROM debts d JOIN friends f ON f.id = d.borrower_id "
+            "WHERE f.name = 'Pratham' AND d.status = 'Active'")
+
+
+@pytest.fixture
+def local_db(tmp_path, monkeypatch):
+    """A throwaway SQLite backend with one friend owing 'Me' 200."""
+    path = str(tmp_path / "tracker.db")
+    monkeypatch.setattr(database, "BACKEND", "sqlite")
+    monkeypatch.setattr(sqlite_backend, "DB_FILE", path)
+    # Restored on teardown, so other tests keep their client
+    monkeypatch.setattr(database, "supabase", database.supabase)
+    monkeypatch.setattr(database, "_instrumented", database._instrumented)
+    database.set_client(sqlite_backend.SQLiteClient(path))
+
+    client = database.get_client()
+    me, pratham = client.table("friends").insert([{"name": "Me"}, {"name": "Pratham"}]).execute().data
+    client.table("debts").insert({"date": "2024-01-01", "borrower_id": pratham["id"], "lender_id": me["id"],
+                                  "amount": 200.0, "status": "Active"}).execute()
+    social_manager.invalidate_friend_cache()
+    analysis.clear_query_cache()
+    yield client
+    analysis.clear_query_cache()
+    social_manager.invalidate_friend_cache()
+
+
+def test_cached_template_gives_the_same_answer(local_db, monkeypatch):
+    # Every result is stale, so the second ask really runs the SQL filled from the template
+    monkeypatch.setattr(analysis, "RESULT_CACHE_TTL", -1)
+    prompts = []
+
+    def ai(prompt):
+        prompts.append(prompt)
+        return OWED_SQL
+
+    first = analysis.ask_database("How much does Pratham owe me?", ai)
+    second = analysis.ask_database("how much does pratham owe me", ai)
+
+    assert len(prompts) == 1
+    assert analysis.get_cache_stats()["template_hits"] == 1
+    assert "200.0" in first
+    assert second == first